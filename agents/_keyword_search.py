@@ -0,0 +1,57 @@
+"""
+Keyword search used when embeddings are unavailable.
+Documents are stored as rows of vocabulary IDs so a query is one vectorized scan.
+"""
+
+import re
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\w+")
+
+# Fills the unused tail of shorter rows; never a valid vocabulary ID
+PAD_ID = -1
+
+
+def tokenize(text: str) -> set:
+    """Return the set of lowercase word tokens in text."""
+    return set(TOKEN_RE.findall(text.lower()))
+
+
+def build_keyword_index(texts: Sequence[str]) -> Tuple[Dict[str, int], np.ndarray]:
+    """Encode documents as padded rows of distinct vocabulary IDs.
+
+    Args:
+        texts: Document texts
+
+    Returns:
+        Tuple of (vocabulary mapping token to ID, int32 matrix of shape
+        (num_documents, max_distinct_tokens) padded with PAD_ID)
+    """
+    doc_tokens = [tokenize(text) for text in texts]
+    vocab = {token: i for i, token in enumerate(sorted(set().union(*doc_tokens)))}
+    width = max((len(tokens) for tokens in doc_tokens), default=0)
+    token_ids = np.full((len(texts), width), PAD_ID, dtype=np.int32)
+    for row, tokens in enumerate(doc_tokens):
+        token_ids[row, :len(tokens)] = sorted(vocab[token] for token in tokens)
+    return vocab, token_ids
+
+
+def keyword_matches(query: str, vocab: Dict[str, int], token_ids: np.ndarray) -> np.ndarray:
+    """Find documents sharing at least one token with a query.
+
+    Args:
+        query: Search query
+        vocab: Vocabulary returned by build_keyword_index
+        token_ids: Token ID matrix returned by build_keyword_index
+
+    Returns:
+        Positions of matching documents in corpus order
+    """
+    query_ids = np.fromiter(
+        (vocab[token] for token in tokenize(query) if token in vocab), dtype=np.int32
+    )
+    if query_ids.size == 0:
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.isin(token_ids, query_ids).any(axis=1))
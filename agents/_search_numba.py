@@ -0,0 +1,56 @@
+"""
+Cosine-similarity search used when FAISS is not installed.
+Compiles the scoring loop with Numba when available, otherwise uses NumPy.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _inner_products(query, matrix):
+        n = matrix.shape[0]
+        out = np.empty(n, np.float32)
+        for i in prange(n):
+            s = 0.0
+            for j in range(matrix.shape[1]):
+                s += query[j] * matrix[i, j]
+            out[i] = s
+        return out
+else:
+    def _inner_products(query, matrix):
+        return matrix @ query
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Return a contiguous float32 copy of matrix with L2-normalized rows."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def topk_cosine(query: np.ndarray, matrix: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Find the k rows of a normalized matrix most similar to a query.
+
+    Args:
+        query: Query vector of shape (dimension,)
+        matrix: L2-normalized document matrix of shape (num_documents, dimension)
+        k: Number of results to return
+
+    Returns:
+        Tuple of (scores, positions) sorted by descending cosine similarity
+    """
+    query = normalize_rows(query.reshape(1, -1))[0]
+    scores = _inner_products(query, matrix)
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return scores[top], top
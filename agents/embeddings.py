@@ -0,0 +1,68 @@
+"""
+Embedding helpers for the local RAG agent.
+Wraps the Amazon Bedrock embedding model used for documents and queries.
+"""
+
+import json
+import os
+from typing import List, Sequence
+
+import numpy as np
+
+# Cohere Embed on Bedrock accepts a list of texts per request and
+# distinguishes document and query inputs for asymmetric retrieval
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "cohere.embed-english-v3")
+
+# Largest number of texts Cohere Embed accepts in a single request
+MAX_BATCH_SIZE = 96
+
+_bedrock_client = None
+
+
+def get_bedrock_client():
+    """Return a shared Bedrock runtime client, creating it on first use."""
+    global _bedrock_client
+    if _bedrock_client is None:
+        import boto3
+        _bedrock_client = boto3.client(
+            "bedrock-runtime",
+            region_name=os.getenv("AWS_REGION", "us-west-2"),
+        )
+    return _bedrock_client
+
+
+def _embed_batch(texts: List[str], input_type: str) -> np.ndarray:
+    """Embed one request's worth of texts."""
+    response = get_bedrock_client().invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps({
+            "texts": texts,
+            "input_type": input_type,
+            "truncate": "END",
+        }),
+    )
+    payload = json.loads(response["body"].read())
+    return np.asarray(payload["embeddings"], dtype=np.float32)
+
+
+def embed_texts(texts: Sequence[str], input_type: str = "search_document") -> np.ndarray:
+    """Embed texts with the configured Bedrock embedding model.
+
+    Texts are sent in batches of up to MAX_BATCH_SIZE per request, so
+    embedding a corpus costs one round trip per batch rather than per text.
+
+    Args:
+        texts: Texts to embed
+        input_type: "search_document" for corpus entries, "search_query" for queries
+
+    Returns:
+        Float32 array of shape (len(texts), dimension)
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack([
+        _embed_batch(list(texts[start:start + MAX_BATCH_SIZE]), input_type)
+        for start in range(0, len(texts), MAX_BATCH_SIZE)
+    ])
@@ -3,8 +3,13 @@ Local RAG Agent for Development and Testing
 A Strands agent for RAG queries that can be run locally.
 """
 
+import asyncio
+import hashlib
+import importlib
 import os
+import re
 import sys
+from functools import lru_cache
 from typing import List, Dict, Any
 
 # Handle Windows compatibility
@@ -15,10 +20,271 @@ except ImportError:
     print("Warning: python-dotenv not installed. Environment variables from .env file won't be loaded.")
     pass
 
-def create_local_rag_agent():
-    """Create a local RAG agent for development and testing."""
-    from strands import Agent, tool
-    from strands_tools import calculator, python_repl, http_request
+# Minimum cosine similarity for a document to count as a search hit
+SIMILARITY_THRESHOLD = 0.40
+SEARCH_TOP_K = 3
+
+# Corpus size at which exact search gives way to an HNSW graph index
+HNSW_THRESHOLD = 10_000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Beyond this many vectors even HNSW's full-precision copy is too large to
+# ship and hold in memory, so vectors are product-quantized into an IVF index
+# (IVF_NPROBE of its lists are scanned per query: higher is slower but more
+# accurate)
+IVFPQ_THRESHOLD = 1_000_000
+IVF_NPROBE = 16
+PQ_MAX_SUBQUANTIZERS = 32
+PQ_BITS = 8
+IVF_TRAINING_POINTS_PER_LIST = 256
+
+# Embeddings are projected to this many dimensions once the corpus is large
+# enough to fit a stable PCA; smaller corpora keep the full vectors
+PCA_DIMENSION = 256
+PCA_MIN_TRAINING_POINTS = 1024
+
+# Built document indexes are persisted here so restarts skip re-embedding
+INDEX_CACHE_DIR = os.getenv("INDEX_CACHE_DIR", os.path.join(".cache", "index"))
+
+# python_repl pulls in its sandboxing dependencies on import, so it is
+# only registered when explicitly requested
+ENABLE_REPL = os.getenv("ENABLE_REPL") == "1"
+
+# Semantic cache entries are keyed on the query together with this many of
+# the preceding user turns, so a follow-up such as "tell me more" only hits
+# an answer given in a similar context
+CACHE_CONTEXT_TURNS = 1
+
+# Demo-mode search command, tolerating any whitespace after "search"
+_SEARCH_CMD_RE = re.compile(r"search\s+(.+)")
+
+
+def _new_search_index(dimension: int, num_vectors: int, hnsw_threshold: int, ivfpq_threshold: int):
+    """Create an empty inner-product index sized for the corpus."""
+    import faiss
+
+    if num_vectors < hnsw_threshold:
+        return faiss.IndexFlatIP(dimension)
+    if num_vectors >= ivfpq_threshold:
+        # About 4*sqrt(N) lists, with enough vectors per list to train them
+        nlist = max(1, min(int(4 * num_vectors ** 0.5), num_vectors // 39))
+        subquantizers = next(m for m in range(min(PQ_MAX_SUBQUANTIZERS, dimension), 0, -1) if dimension % m == 0)
+        index = faiss.index_factory(dimension, f"IVF{nlist},PQ{subquantizers}x{PQ_BITS}", faiss.METRIC_INNER_PRODUCT)
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+        return index
+    index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def build_document_index(
+    embeddings,
+    hnsw_threshold: int = HNSW_THRESHOLD,
+    pca_min_training_points: int = PCA_MIN_TRAINING_POINTS,
+    ivfpq_threshold: int = IVFPQ_THRESHOLD,
+):
+    """Build an inner-product FAISS index over L2-normalized document embeddings.
+
+    Small corpora use an exact flat index; larger ones switch to HNSW for
+    logarithmic-time approximate search, and the largest to an IVF index of
+    product-quantized codes, a few dozen bytes per vector. Once there are
+    enough vectors to fit it, a PCA projection to PCA_DIMENSION (followed by
+    re-normalization) is folded into the index, so stored vectors and every
+    search touch a fraction of the original bytes while callers keep passing
+    full vectors.
+
+    Args:
+        embeddings: Float32 array of shape (num_documents, dimension)
+        hnsw_threshold: Corpus size at which the HNSW index is used
+        pca_min_training_points: Corpus size needed before PCA is fitted
+        ivfpq_threshold: Corpus size at which the IVF-PQ index is used
+
+    Returns:
+        FAISS index whose inner-product scores are cosine similarities
+    """
+    import faiss
+    import numpy as np
+
+    faiss.normalize_L2(embeddings)
+    num_vectors, dimension = embeddings.shape
+    if num_vectors >= pca_min_training_points and dimension > PCA_DIMENSION:
+        pca = faiss.PCAMatrix(dimension, PCA_DIMENSION)
+        pca.train(embeddings)
+        index = faiss.IndexPreTransform(
+            _new_search_index(PCA_DIMENSION, num_vectors, hnsw_threshold, ivfpq_threshold)
+        )
+        index.prepend_transform(faiss.NormalizationTransform(PCA_DIMENSION, 2.0))
+        index.prepend_transform(pca)
+    else:
+        index = _new_search_index(dimension, num_vectors, hnsw_threshold, ivfpq_threshold)
+    if not index.is_trained:
+        ivf = faiss.extract_index_ivf(index)
+        sample_size = min(num_vectors, ivf.nlist * IVF_TRAINING_POINTS_PER_LIST)
+        sample = np.random.default_rng(0).choice(num_vectors, sample_size, replace=False)
+        index.train(embeddings[np.sort(sample)])
+    index.add(embeddings)
+    return index
+
+
+def load_or_build_document_index(doc_texts, embeddings_module, index_dir: str = INDEX_CACHE_DIR):
+    """Load the document index from disk, embedding and building it on a miss.
+
+    The file name is derived from the embedding model and corpus contents, so
+    a changed corpus or model never reuses a stale index.
+
+    Args:
+        doc_texts: Document texts in index order
+        embeddings_module: Module providing embed_texts and EMBEDDING_MODEL_ID
+        index_dir: Directory where built indexes are persisted
+
+    Returns:
+        FAISS index over the document embeddings
+    """
+    import faiss
+
+    digest = hashlib.sha256(embeddings_module.EMBEDDING_MODEL_ID.encode())
+    for text in doc_texts:
+        digest.update(b"\0" + text.encode())
+    index_path = os.path.join(index_dir, f"{digest.hexdigest()[:32]}.faiss")
+
+    if os.path.exists(index_path):
+        return faiss.read_index(index_path)
+
+    index = build_document_index(embeddings_module.embed_texts(doc_texts))
+    os.makedirs(index_dir, exist_ok=True)
+    faiss.write_index(index, index_path)
+    return index
+
+
+def _import_local_module(name: str):
+    """Import a sibling module whether run as a script or as a package."""
+    try:
+        return importlib.import_module(f"agents.{name}")
+    except ImportError:
+        return importlib.import_module(name)
+
+
+def create_query_cache():
+    """Create the semantic query cache used in front of the agent.
+
+    Returns:
+        Tuple of (cache, embed_texts), or (None, None) if dependencies are missing
+    """
+    try:
+        import faiss
+        SemanticCache = _import_local_module("semantic_cache").SemanticCache
+        return SemanticCache(), _import_local_module("embeddings").embed_texts
+    except ImportError as e:
+        print(f"Warning: Semantic query cache disabled ({e}).")
+        return None, None
+
+
+def _cache_key_text(agent, user_input: str) -> str:
+    """Text embedded as the cache key: recent user turns followed by the query.
+
+    Tool results are also sent as user messages, so only text turns count.
+    """
+    turns = [
+        block["text"]
+        for message in agent.messages
+        if message["role"] == "user"
+        for block in message["content"]
+        if "text" in block
+    ]
+    return "\n".join(turns[len(turns) - CACHE_CONTEXT_TURNS:] + [user_input]) if turns else user_input
+
+
+def _cache_lookup(agent, user_input: str, cache=None, embed_texts=None):
+    """Embed a query in its conversation context and look it up in the semantic cache.
+
+    Returns:
+        Tuple of (query_embedding, cached_response); the embedding is None
+        when caching is unavailable and the response is None on a miss
+    """
+    if cache is None:
+        return None, None
+    
+    try:
+        query_embedding = embed_texts([_cache_key_text(agent, user_input)], input_type="search_query")
+    except Exception as e:
+        print(f"Warning: Could not embed query for caching ({e}).")
+        return None, None
+    
+    return query_embedding, cache.get(query_embedding)
+
+
+def _record_cached_exchange(agent, user_input: str, response: str) -> None:
+    """Add a cache-served exchange to the agent's messages, as a real turn would."""
+    agent.messages.append({"role": "user", "content": [{"text": user_input}]})
+    agent.messages.append({"role": "assistant", "content": [{"text": response}]})
+
+
+def ask_agent(agent, user_input: str, cache=None, embed_texts=None) -> str:
+    """Answer from the semantic cache when a similar query was seen, otherwise ask the agent.
+
+    Args:
+        agent: Strands agent to call on a cache miss
+        user_input: User query
+        cache: Optional SemanticCache instance
+        embed_texts: Embedding function used to key the cache
+
+    Returns:
+        Agent response text
+    """
+    query_embedding, response = _cache_lookup(agent, user_input, cache, embed_texts)
+    if response is not None:
+        _record_cached_exchange(agent, user_input, response)
+        return response
+    
+    response = str(agent(user_input))
+    if query_embedding is not None:
+        cache.put(query_embedding, response)
+    return response
+
+
+async def stream_agent(agent, user_input: str, cache=None, embed_texts=None) -> str:
+    """Like ask_agent, but prints the response as it is generated.
+
+    Args:
+        agent: Strands agent to stream from on a cache miss
+        user_input: User query
+        cache: Optional SemanticCache instance
+        embed_texts: Embedding function used to key the cache
+
+    Returns:
+        Agent response text
+    """
+    loop = asyncio.get_running_loop()
+    query_embedding, response = await loop.run_in_executor(None, _cache_lookup, agent, user_input, cache, embed_texts)
+    if response is not None:
+        _record_cached_exchange(agent, user_input, response)
+        print(response, end="", flush=True)
+        return response
+    
+    chunks = []
+    async for event in agent.stream_async(user_input):
+        if "data" in event:
+            print(event["data"], end="", flush=True)
+            chunks.append(event["data"])
+    
+    response = "".join(chunks)
+    if query_embedding is not None:
+        cache.put(query_embedding, response)
+    return response
+
+
+@lru_cache(maxsize=None)
+def _create_local_tools() -> tuple:
+    """Build the local agent's tools once per process.
+
+    The tools hold no conversation state, so every agent shares them and
+    the corpus behind search_documents is only embedded once.
+    """
+    from strands import tool
+    from strands_tools import calculator, http_request
     
     # Sample document store (in production, this would be a vector database)
     sample_documents = {
@@ -27,6 +293,26 @@ def create_local_rag_agent():
         "doc3": "AWS CDK (Cloud Development Kit) allows you to define cloud infrastructure using familiar programming languages like Python, TypeScript, and Java.",
         "doc4": "Vector databases store high-dimensional vectors and enable efficient similarity search for applications like semantic search and recommendation systems."
     }
+    doc_ids, doc_texts = zip(*sample_documents.items())
+    # Encode the corpus as vocabulary IDs once for the keyword fallback
+    keyword_search = _import_local_module("_keyword_search")
+    vocab, doc_token_ids = keyword_search.build_keyword_index(doc_texts)
+    
+    # Embed the corpus once so each search is a single inner-product probe.
+    # Without FAISS, a compiled cosine kernel over a normalized matrix is used.
+    doc_index = None
+    doc_matrix = None
+    try:
+        embeddings = _import_local_module("embeddings")
+        embed_texts = embeddings.embed_texts
+        try:
+            import faiss
+            doc_index = load_or_build_document_index(doc_texts, embeddings)
+        except ImportError:
+            numba_search = _import_local_module("_search_numba")
+            doc_matrix = numba_search.normalize_rows(embed_texts(doc_texts))
+    except Exception as e:
+        print(f"Warning: Semantic search unavailable ({e}). Falling back to keyword search.")
     
     @tool
     def search_documents(query: str) -> str:
@@ -38,13 +324,25 @@ def create_local_rag_agent():
         Returns:
             Relevant document excerpts
         """
-        # Simple keyword-based search (in production, use semantic similarity)
-        query_lower = query.lower()
         relevant_docs = []
         
-        for doc_id, content in sample_documents.items():
-            if any(word in content.lower() for word in query_lower.split()):
-                relevant_docs.append(f"[{doc_id}] {content}")
+        if doc_index is not None or doc_matrix is not None:
+            query_embedding = embed_texts([query], input_type="search_query")
+            if doc_index is not None:
+                faiss.normalize_L2(query_embedding)
+                scores, positions = doc_index.search(query_embedding, min(SEARCH_TOP_K, len(doc_ids)))
+                scores, positions = scores[0], positions[0]
+            else:
+                scores, positions = numba_search.topk_cosine(query_embedding[0], doc_matrix, SEARCH_TOP_K)
+            for score, position in zip(scores, positions):
+                if position >= 0 and score >= SIMILARITY_THRESHOLD:
+                    relevant_docs.append(f"[{doc_ids[position]}] {doc_texts[position]}")
+        else:
+            # Keyword-based fallback when embeddings are unavailable
+            relevant_docs = [
+                f"[{doc_ids[position]}] {doc_texts[position]}"
+                for position in keyword_search.keyword_matches(query, vocab, doc_token_ids)
+            ]
         
         if relevant_docs:
             return "Found relevant information:\n" + "\n\n".join(relevant_docs)
@@ -58,12 +356,12 @@ def create_local_rag_agent():
         Returns:
             Project information and capabilities
         """
-        return """This is the Strands RAG Pipeline project - a multimodal agentic RAG system built with:
+        return f"""This is the Strands RAG Pipeline project - a multimodal agentic RAG system built with:
 
 **Strands Agents SDK**: Multi-LLM agent framework with tool support
 **AWS Infrastructure**: CDK-based cloud infrastructure with S3, DynamoDB, Lambda, and API Gateway
 **RAG Capabilities**: Document search, embedding storage, and conversation context
-**Built-in Tools**: Calculator, Python REPL, HTTP requests, and custom document search
+**Built-in Tools**: Calculator, {"Python REPL, " if ENABLE_REPL else ""}HTTP requests, and custom document search
 
 Current status: Development environment ready for testing and expansion."""
     
@@ -74,32 +372,46 @@ Current status: Development environment ready for testing and expansion."""
         Returns:
             Description of available tools
         """
-        return """Available tools in this RAG agent:
+        repl_line = "**python_repl**: Execute Python code for data analysis and processing\n" if ENABLE_REPL else ""
+        return f"""Available tools in this RAG agent:
 
 **search_documents**: Search through uploaded documents for relevant information
 **get_project_info**: Get information about this Strands RAG pipeline project  
 **calculator**: Perform mathematical calculations
-**python_repl**: Execute Python code for data analysis and processing
-**http_request**: Make HTTP requests to external APIs
+{repl_line}**http_request**: Make HTTP requests to external APIs
 **list_available_tools**: Show this list of available tools
 
 You can ask me to use any of these tools to help with your queries!"""
     
-    # Create the agent
-    agent = Agent(
-        tools=[
-            search_documents, 
-            get_project_info, 
-            list_available_tools,
-            calculator, 
-            python_repl, 
-            http_request
-        ],
-        system_prompt="""You are an intelligent RAG assistant for the Strands RAG Pipeline project. You have access to:
+    tools = [
+        search_documents, 
+        get_project_info, 
+        list_available_tools,
+        calculator, 
+        http_request
+    ]
+    if ENABLE_REPL:
+        from strands_tools import python_repl
+        tools.append(python_repl)
+    
+    return tuple(tools)
+
+
+def new_local_rag_agent():
+    """Create a local RAG agent with its own conversation state.
+
+    Strands agents handle one request at a time, so callers running
+    queries concurrently need an agent each; the tools are shared.
+    """
+    from strands import Agent
+    
+    return Agent(
+        tools=list(_create_local_tools()),
+        system_prompt=f"""You are an intelligent RAG assistant for the Strands RAG Pipeline project. You have access to:
 
 1. **Document Search**: Search through available documents and knowledge base
 2. **Project Information**: Details about the current Strands RAG pipeline implementation  
-3. **Computational Tools**: Calculator and Python REPL for analysis
+3. **Computational Tools**: Calculator{" and Python REPL" if ENABLE_REPL else ""} for analysis
 4. **External Access**: HTTP requests for additional information
 
 **Your role:**
@@ -116,39 +428,55 @@ You can ask me to use any of these tools to help with your queries!"""
 - Be helpful, accurate, and educational
 - Explain technical concepts clearly
 
-Ready to help with your RAG pipeline questions!"""
+Ready to help with your RAG pipeline questions!""",
+        # Responses are printed by stream_agent as they arrive
+        callback_handler=None,
     )
-    
-    return agent
 
 
-def demo_mode():
-    """Run a simple demo mode without Strands agent."""
-    print("Demo Mode - Simulating RAG Pipeline")
-    print("Available commands: 'project', 'search <query>', 'tools', 'quit'")
-    
-    sample_responses = {
-        "project": """This is the Strands RAG Pipeline project - a multimodal agentic RAG system built with:
+@lru_cache(maxsize=None)
+def create_local_rag_agent():
+    """Create a local RAG agent for development and testing.
+
+    The agent is built once per process; later calls return the same
+    instance so the Strands imports, tool registration, and corpus
+    embedding are not repeated.
+    """
+    return new_local_rag_agent()
+
+
+DEMO_RESPONSES = {
+    "project": """This is the Strands RAG Pipeline project - a multimodal agentic RAG system built with:
 
 **Strands Agents SDK**: Multi-LLM agent framework with tool support
 **AWS Infrastructure**: CDK-based cloud infrastructure with S3, DynamoDB, Lambda, and API Gateway
 **RAG Capabilities**: Document search, embedding storage, and conversation context
 **Built-in Tools**: Calculator, Python REPL, HTTP requests, and custom document search""",
-        
-        "tools": """Available tools in this RAG agent:
+
+    "tools": """Available tools in this RAG agent:
 
 **search_documents**: Search through uploaded documents for relevant information
 **get_project_info**: Get information about this Strands RAG pipeline project  
 **calculator**: Perform mathematical calculations
 **python_repl**: Execute Python code for data analysis and processing
 **http_request**: Make HTTP requests to external APIs""",
-        
-        "strands": "Strands is an AI agent framework that supports multiple LLM providers including Bedrock, Anthropic, OpenAI, Gemini, and Meta Llama.",
-        
-        "rag": "RAG (Retrieval-Augmented Generation) combines information retrieval with language generation to provide more accurate and contextual responses.",
-        
-        "cdk": "AWS CDK (Cloud Development Kit) allows you to define cloud infrastructure using familiar programming languages like Python, TypeScript, and Java."
-    }
+
+    "strands": "Strands is an AI agent framework that supports multiple LLM providers including Bedrock, Anthropic, OpenAI, Gemini, and Meta Llama.",
+
+    "rag": "RAG (Retrieval-Augmented Generation) combines information retrieval with language generation to provide more accurate and contextual responses.",
+
+    "cdk": "AWS CDK (Cloud Development Kit) allows you to define cloud infrastructure using familiar programming languages like Python, TypeScript, and Java."
+}
+
+# All demo keywords in one alternation, so a search scans the query once
+# instead of testing each keyword with a separate substring check
+_DEMO_KEYWORD_RE = re.compile("|".join(re.escape(key) for key in DEMO_RESPONSES))
+
+
+def demo_mode():
+    """Run a simple demo mode without Strands agent."""
+    print("Demo Mode - Simulating RAG Pipeline")
+    print("Available commands: 'project', 'search <query>', 'tools', 'quit'")
     
     while True:
         try:
@@ -161,25 +489,86 @@ def demo_mode():
             print("Goodbye!")
             break
             
+        search_command = _SEARCH_CMD_RE.match(user_input)
+        
         if user_input == 'project':
-            print("Demo:", sample_responses["project"])
+            print("Demo:", DEMO_RESPONSES["project"])
         elif user_input == 'tools':
-            print("Demo:", sample_responses["tools"])
-        elif user_input.startswith('search '):
-            query = user_input[7:]
-            found = False
-            for key, response in sample_responses.items():
-                if key in query:
-                    print(f"Demo: Found information about '{key}':")
-                    print(response)
-                    found = True
-                    break
-            if not found:
+            print("Demo:", DEMO_RESPONSES["tools"])
+        elif search_command:
+            query = search_command.group(1)
+            match = _DEMO_KEYWORD_RE.search(query)
+            if match:
+                key = match.group(0)
+                print(f"Demo: Found information about '{key}':")
+                print(DEMO_RESPONSES[key])
+            else:
                 print(f"Demo: No documents found matching '{query}'. Try: 'search strands', 'search rag', or 'search cdk'")
         else:
             print("Demo: Available commands: 'project', 'search <query>', 'tools', 'quit'")
 
 
+def _is_exit_command(user_input: str) -> bool:
+    return user_input.lower() in ['quit', 'exit', 'bye']
+
+
+def _print_query_error(e: Exception):
+    print(f"Error: {str(e)}")
+    print("This might be due to missing API keys. Check your .env file.")
+    print()
+
+
+async def chat_loop(agent, cache=None, embed_texts=None):
+    """Interactive loop that reads input off the event loop and streams responses."""
+    loop = asyncio.get_running_loop()
+    
+    while True:
+        try:
+            user_input = (await loop.run_in_executor(None, input, "You: ")).strip()
+        except (KeyboardInterrupt, EOFError):
+            print("\nGoodbye!")
+            break
+        
+        if _is_exit_command(user_input):
+            print("Goodbye!")
+            break
+        
+        if not user_input:
+            continue
+        
+        try:
+            print("Agent: ", end="", flush=True)
+            await stream_agent(agent, user_input, cache, embed_texts)
+            print("\n")
+        except Exception as e:
+            _print_query_error(e)
+
+
+def chat_loop_sync(agent, cache=None, embed_texts=None):
+    """Blocking interactive loop, used where console input can't run in an executor (Windows)."""
+    while True:
+        try:
+            user_input = input("You: ").strip()
+        except (KeyboardInterrupt, EOFError):
+            print("\nGoodbye!")
+            break
+        
+        if _is_exit_command(user_input):
+            print("Goodbye!")
+            break
+        
+        if not user_input:
+            continue
+        
+        try:
+            print("Agent: ", end="")
+            response = ask_agent(agent, user_input, cache, embed_texts)
+            print(response)
+            print()
+        except Exception as e:
+            _print_query_error(e)
+
+
 def main():
     """Main function to run the local RAG agent interactively."""
     print("Strands RAG Pipeline Agent")
@@ -188,32 +577,14 @@ def main():
     
     try:
         agent = create_local_rag_agent()
+        cache, embed_texts = create_query_cache()
         print("Agent initialized successfully!")
         print("Try asking: 'What is this project about?' or 'Search for information about Strands'\n")
         
-        while True:
-            try:
-                user_input = input("You: ").strip()
-            except (KeyboardInterrupt, EOFError):
-                print("\nGoodbye!")
-                break
-            
-            if user_input.lower() in ['quit', 'exit', 'bye']:
-                print("Goodbye!")
-                break
-            
-            if not user_input:
-                continue
-            
-            try:
-                print("Agent: ", end="")
-                response = agent(user_input)
-                print(response)
-                print()
-            except Exception as e:
-                print(f"Error: {str(e)}")
-                print("This might be due to missing API keys. Check your .env file.")
-                print()
+        if sys.platform == "win32":
+            chat_loop_sync(agent, cache, embed_texts)
+        else:
+            asyncio.run(chat_loop(agent, cache, embed_texts))
                 
     except Exception as e:
         print(f"Failed to initialize agent: {str(e)}")
@@ -0,0 +1,122 @@
+"""
+Semantic Query Cache
+Serves repeated or paraphrased questions from memory instead of the LLM.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+
+class SemanticCache:
+    """LRU cache of agent responses keyed by query embedding similarity.
+
+    Query embeddings are L2-normalized and stored in a FAISS inner-product
+    index, so a lookup is a single nearest-neighbour probe whose score is
+    the cosine similarity to the closest cached query.
+    """
+
+    def __init__(
+        self,
+        capacity: int = 1000,
+        tau: float = 0.85,
+        duplicate_threshold: float = 0.95,
+        default_ttl: float = 300,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Create an empty cache.
+
+        Args:
+            capacity: Maximum number of cached responses before LRU eviction
+            tau: Minimum query-to-query cosine similarity for a cache hit
+            duplicate_threshold: Similarity above which a new entry replaces an old one
+            default_ttl: Seconds a cached response stays valid
+            clock: Time source, injectable for testing
+        """
+        self.capacity = capacity
+        self.tau = tau
+        self.duplicate_threshold = duplicate_threshold
+        self.default_ttl = default_ttl
+        self._clock = clock
+        self._index = None
+        self._next_id = 0
+        # entry id -> (response, expires_at), ordered from least to most recently used
+        self._entries: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, query_embedding: np.ndarray, tau: Optional[float] = None) -> Optional[str]:
+        """Return the cached response for the most similar query, if close enough.
+
+        Args:
+            query_embedding: Embedding of the incoming query
+            tau: Optional per-call override of the similarity threshold
+
+        Returns:
+            Cached response, or None on a miss
+        """
+        match = self._nearest(query_embedding)
+        if match is None:
+            return None
+
+        entry_id, similarity = match
+        response, expires_at = self._entries[entry_id]
+        if expires_at <= self._clock():
+            self._remove(entry_id)
+            return None
+        if similarity < (self.tau if tau is None else tau):
+            return None
+
+        self._entries.move_to_end(entry_id)
+        return response
+
+    def put(self, query_embedding: np.ndarray, response: str, ttl: Optional[float] = None) -> None:
+        """Cache a response for a query embedding.
+
+        Args:
+            query_embedding: Embedding of the answered query
+            response: Agent response to cache
+            ttl: Optional per-entry lifetime in seconds
+        """
+        import faiss
+
+        vector = self._normalize(query_embedding)
+
+        match = self._nearest(vector)
+        if match is not None and match[1] > self.duplicate_threshold:
+            self._remove(match[0])
+        while len(self._entries) >= self.capacity:
+            self._remove(next(iter(self._entries)))
+
+        if self._index is None:
+            self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+        expires_at = self._clock() + (self.default_ttl if ttl is None else ttl)
+        self._entries[entry_id] = (response, expires_at)
+
+    def _nearest(self, query_embedding: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Return (entry id, cosine similarity) of the closest cached query."""
+        if not self._entries:
+            return None
+        scores, ids = self._index.search(self._normalize(query_embedding), 1)
+        if ids[0][0] < 0:
+            return None
+        return int(ids[0][0]), float(scores[0][0])
+
+    def _remove(self, entry_id: int) -> None:
+        self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+        del self._entries[entry_id]
+
+    @staticmethod
+    def _normalize(query_embedding: np.ndarray) -> np.ndarray:
+        import faiss
+
+        vector = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
@@ -3,6 +3,7 @@ Example: Basic RAG Agent Usage
 Demonstrates how to create and use a simple RAG agent locally.
 """
 
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -12,7 +13,15 @@ load_dotenv()
 # Import from the agents module
 import sys
 sys.path.append('..')
-from agents.rag_agent import create_local_rag_agent
+from agents.rag_agent import new_local_rag_agent
+
+
+async def run_queries(agents, queries):
+    """Run independent queries concurrently, one agent per query."""
+    return await asyncio.gather(
+        *(agent.invoke_async(query) for agent, query in zip(agents, queries)),
+        return_exceptions=True,
+    )
 
 
 def main():
@@ -22,11 +31,6 @@ def main():
     print("=" * 60)
     
     try:
-        # Create the agent
-        print("\n1. Creating RAG agent...")
-        agent = create_local_rag_agent()
-        print("Agent created successfully!")
-        
         # Example queries
         queries = [
             "What is this project about?",
@@ -34,18 +38,23 @@ def main():
             "What tools are available?",
         ]
         
-        print("\n2. Running example queries...\n")
+        # Create one agent per query
+        print("\n1. Creating RAG agents...")
+        agents = [new_local_rag_agent() for _ in queries]
+        print("Agents created successfully!")
+        
+        print("\n2. Running example queries concurrently...\n")
+        responses = asyncio.run(run_queries(agents, queries))
         
-        for i, query in enumerate(queries, 1):
+        for i, (query, response) in enumerate(zip(queries, responses), 1):
             print(f"\n{'=' * 60}")
             print(f"Query {i}: {query}")
             print("-" * 60)
             
-            try:
-                response = agent(query)
+            if isinstance(response, Exception):
+                print(f"Error: {str(response)}")
+            else:
                 print(f"Response: {response}")
-            except Exception as e:
-                print(f"Error: {str(e)}")
         
         print(f"\n{'=' * 60}")
         print("Example completed successfully!")
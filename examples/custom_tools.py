@@ -3,6 +3,7 @@ Example: Custom Tool Integration
 Demonstrates how to create and integrate custom tools with the RAG agent.
 """
 
+import asyncio
 from typing import Dict, Any
 from strands import Agent, tool
 from strands_tools import calculator
@@ -50,6 +51,24 @@ def database_query(query: str) -> str:
         return "Query executed successfully, 0 results"
 
 
+def create_agent() -> Agent:
+    """Create an agent with the custom tools."""
+    return Agent(
+        tools=[weather_lookup, database_query, calculator],
+        system_prompt="""You are a helpful assistant with access to weather information, 
+        database queries, and a calculator. Use these tools to help answer user questions.""",
+        callback_handler=None,
+    )
+
+
+async def run_queries(agents, queries):
+    """Run independent queries concurrently, one agent per query."""
+    return await asyncio.gather(
+        *(agent.invoke_async(query) for agent, query in zip(agents, queries)),
+        return_exceptions=True,
+    )
+
+
 def main():
     """Run custom tool integration example."""
     print("=" * 60)
@@ -57,15 +76,6 @@ def main():
     print("=" * 60)
     
     try:
-        # Create agent with custom tools
-        print("\n1. Creating agent with custom tools...")
-        agent = Agent(
-            tools=[weather_lookup, database_query, calculator],
-            system_prompt="""You are a helpful assistant with access to weather information, 
-            database queries, and a calculator. Use these tools to help answer user questions."""
-        )
-        print("Agent created with custom tools!")
-        
         # Example queries
         queries = [
             "What's the weather like in Seattle?",
@@ -73,18 +83,23 @@ def main():
             "What's 25 * 47?",
         ]
         
-        print("\n2. Running example queries with custom tools...\n")
+        # Create one agent per query with custom tools
+        print("\n1. Creating agents with custom tools...")
+        agents = [create_agent() for _ in queries]
+        print("Agents created with custom tools!")
+        
+        print("\n2. Running example queries with custom tools concurrently...\n")
+        responses = asyncio.run(run_queries(agents, queries))
         
-        for i, query in enumerate(queries, 1):
+        for i, (query, response) in enumerate(zip(queries, responses), 1):
             print(f"\n{'=' * 60}")
             print(f"Query {i}: {query}")
             print("-" * 60)
             
-            try:
-                response = agent(query)
+            if isinstance(response, Exception):
+                print(f"Error: {str(response)}")
+            else:
                 print(f"Response: {response}")
-            except Exception as e:
-                print(f"Error: {str(e)}")
         
         print(f"\n{'=' * 60}")
         print("Example completed successfully!")
@@ -4,12 +4,16 @@ Creates AWS infrastructure for a multimodal agentic RAG pipeline using Strands a
 """
 
 from aws_cdk import (
+    BundlingOptions,
     Stack,
     aws_s3 as s3,
     aws_lambda as _lambda,
     aws_apigateway as apigateway,
+    aws_dax as dax,
     aws_dynamodb as dynamodb,
+    aws_ec2 as ec2,
     aws_iam as iam,
+    aws_sqs as sqs,
     RemovalPolicy,
     Duration,
     Tags,
@@ -17,12 +21,26 @@ from aws_cdk import (
 )
 from constructs import Construct
 
+# Python 3.12 on Graviton by default: faster interpreter and lower cost per
+# GB-second. All bundled dependencies (including numpy) publish manylinux
+# aarch64 wheels. Override with -c lambda_architecture=x86_64.
+LAMBDA_RUNTIME = _lambda.Runtime.PYTHON_3_12
+LAMBDA_ARCHITECTURES = {
+    "arm64": _lambda.Architecture.ARM_64,
+    "x86_64": _lambda.Architecture.X86_64,
+}
+
+# X-Ray traces split each invocation into INIT, handler, Bedrock, and
+# DynamoDB time; Lambda Insights adds per-invocation memory and CPU metrics
+LAMBDA_INSIGHTS_VERSION = _lambda.LambdaInsightsVersion.VERSION_1_0_498_0
+
 
 class RagPipelineStack(Stack):
     """Stack for the Strands RAG Pipeline infrastructure."""
 
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
+        self.lambda_architecture = self._lambda_architecture()
         
         # Add stack-level tags
         Tags.of(self).add("Project", "StrandsRAGPipeline")
@@ -39,6 +57,15 @@ class RagPipelineStack(Stack):
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
             removal_policy=RemovalPolicy.DESTROY,  # For development
             auto_delete_objects=True,  # For development
+            # Browsers upload multipart parts directly and need the part ETags back
+            cors=[
+                s3.CorsRule(
+                    allowed_methods=[s3.HttpMethods.PUT],
+                    allowed_origins=["*"],
+                    allowed_headers=["*"],
+                    exposed_headers=["ETag"],
+                )
+            ],
             lifecycle_rules=[
                 s3.LifecycleRule(
                     id="DeleteOldVersions",
@@ -54,6 +81,13 @@ class RagPipelineStack(Stack):
         )
         Tags.of(self.document_bucket).add("Purpose", "DocumentStorage")
 
+        # On-demand capacity suits unpredictable traffic; once load is known,
+        # provisioned capacity with auto scaling is cheaper per request
+        # (cdk deploy -c table_billing_mode=PROVISIONED)
+        billing_mode = self._table_billing_mode()
+        provisioned = billing_mode == dynamodb.BillingMode.PROVISIONED
+        table_capacity = {"read_capacity": 5, "write_capacity": 5} if provisioned else {}
+
         # DynamoDB table for conversation history and metadata
         self.conversation_table = dynamodb.Table(
             self,
@@ -65,7 +99,8 @@ class RagPipelineStack(Stack):
             sort_key=dynamodb.Attribute(
                 name="timestamp", type=dynamodb.AttributeType.STRING
             ),
-            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            billing_mode=billing_mode,
+            **table_capacity,
             removal_policy=RemovalPolicy.DESTROY,  # For development
             point_in_time_recovery=True,
             time_to_live_attribute="ttl",
@@ -80,12 +115,19 @@ class RagPipelineStack(Stack):
             partition_key=dynamodb.Attribute(
                 name="document_id", type=dynamodb.AttributeType.STRING
             ),
-            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            billing_mode=billing_mode,
+            **table_capacity,
             removal_policy=RemovalPolicy.DESTROY,  # For development
             point_in_time_recovery=True,
+            # Expires cached query embeddings
+            time_to_live_attribute="ttl",
         )
         Tags.of(self.embeddings_table).add("Purpose", "EmbeddingsMetadata")
 
+        if provisioned:
+            for table in (self.conversation_table, self.embeddings_table):
+                self._auto_scale_table(table)
+
         # IAM role for Lambda functions
         self.lambda_role = iam.Role(
             self,
@@ -117,48 +159,144 @@ class RagPipelineStack(Stack):
             )
         )
 
+        # Optional DAX cluster in front of the conversation table (cdk deploy -c enable_dax=true)
+        self.vpc = None
+        self.dax_client_security_group = None
+        self.dax_cluster = None
+        if self._context_flag("enable_dax"):
+            self._create_dax_cluster()
+
+        # Third-party dependencies ship in a layer, installed for the target
+        # architecture and precompiled to bytecode so cold starts skip compiling
+        # imports. The layer only rebuilds when requirements.txt changes.
+        # The bytecode uses unchecked-hash invalidation: asset zips normalize
+        # file mtimes, so timestamp-checked .pyc files would all look stale,
+        # and /opt is read-only, so Python would recompile on every cold start.
+        self.dependencies_layer = _lambda.LayerVersion(
+            self,
+            "DependenciesLayer",
+            description="Python dependencies for the Strands RAG pipeline functions",
+            compatible_runtimes=[LAMBDA_RUNTIME],
+            compatible_architectures=[self.lambda_architecture],
+            code=_lambda.Code.from_asset(
+                "lambda",
+                exclude=["*", "!requirements.txt"],
+                bundling=BundlingOptions(
+                    image=LAMBDA_RUNTIME.bundling_image,
+                    platform=self.lambda_architecture.docker_platform,
+                    command=[
+                        "bash",
+                        "-c",
+                        "pip install --no-cache-dir --no-compile -r requirements.txt -t /asset-output/python"
+                        " && python -m compileall -q --invalidation-mode unchecked-hash /asset-output/python",
+                    ],
+                ),
+            ),
+        )
+
+        # Function code only; both functions share this asset
+        self.lambda_code = _lambda.Code.from_asset(
+            "lambda",
+            exclude=["__pycache__", "*.pyc", "requirements.txt"],
+        )
+
+        # Failed asynchronous invocations land here after a single retry
+        # instead of being retried twice and then dropped
+        self.lambda_dead_letter_queue = sqs.Queue(
+            self,
+            "LambdaDeadLetterQueue",
+            retention_period=Duration.days(14),
+        )
+
         # Lambda function for document processing
         self.document_processor = _lambda.Function(
             self,
             "DocumentProcessor",
             function_name="strands-rag-document-processor",
             description="Processes uploaded documents and creates embeddings",
-            runtime=_lambda.Runtime.PYTHON_3_11,
+            runtime=LAMBDA_RUNTIME,
+            architecture=self.lambda_architecture,
             handler="document_processor.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=self.lambda_code,
+            layers=[self.dependencies_layer],
             role=self.lambda_role,
             timeout=Duration.minutes(5),
-            memory_size=1024,
+            # Embedding and DynamoDB writes are batched network I/O, not CPU-bound work.
+            # Override with -c document_processor_memory_mb=... after a power-tuning run.
+            memory_size=self._context_int("document_processor_memory_mb", 512),
             environment={
                 "DOCUMENT_BUCKET": self.document_bucket.bucket_name,
                 "EMBEDDINGS_TABLE": self.embeddings_table.table_name,
                 "LOG_LEVEL": "INFO",
             },
-            reserved_concurrent_executions=10,
+            # Caps parallel cold starts and concurrent Bedrock embedding calls
+            reserved_concurrent_executions=20,
+            dead_letter_queue=self.lambda_dead_letter_queue,
+            retry_attempts=1,
+            tracing=_lambda.Tracing.ACTIVE,
+            insights_version=LAMBDA_INSIGHTS_VERSION,
         )
         Tags.of(self.document_processor).add("Purpose", "DocumentProcessing")
 
+        # Provisioned concurrency keeps initialized RAG agent environments warm.
+        # Lambda does not allow it together with SnapStart, so opting in
+        # (cdk deploy -c rag_agent_provisioned_concurrency=N) replaces SnapStart.
+        provisioned_concurrency = self._context_int("rag_agent_provisioned_concurrency", 0)
+
         # Lambda function for RAG agent
         self.rag_agent = _lambda.Function(
             self,
             "RagAgent",
             function_name="strands-rag-agent",
             description="Main Strands RAG agent for handling queries with conversation context",
-            runtime=_lambda.Runtime.PYTHON_3_11,
+            runtime=LAMBDA_RUNTIME,
+            architecture=self.lambda_architecture,
             handler="rag_agent.handler",
-            code=_lambda.Code.from_asset("lambda"),
+            code=self.lambda_code,
+            layers=[self.dependencies_layer],
             role=self.lambda_role,
             timeout=Duration.minutes(5),
-            memory_size=2048,
+            memory_size=self._context_int("rag_agent_memory_mb", 1024),
             environment={
                 "DOCUMENT_BUCKET": self.document_bucket.bucket_name,
                 "CONVERSATION_TABLE": self.conversation_table.table_name,
                 "EMBEDDINGS_TABLE": self.embeddings_table.table_name,
                 "LOG_LEVEL": "INFO",
             },
-            reserved_concurrent_executions=20,
+            reserved_concurrent_executions=50,
+            dead_letter_queue=self.lambda_dead_letter_queue,
+            retry_attempts=1,
+            tracing=_lambda.Tracing.ACTIVE,
+            insights_version=LAMBDA_INSIGHTS_VERSION,
+            vpc=self.vpc,
+            vpc_subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS) if self.vpc else None,
+            security_groups=[self.dax_client_security_group] if self.vpc else None,
+            # Restore from a snapshot taken after INIT (imports, clients, agent)
+            # instead of re-running it on every cold start
+            snap_start=None if provisioned_concurrency else _lambda.SnapStartConf.ON_PUBLISHED_VERSIONS,
         )
         Tags.of(self.rag_agent).add("Purpose", "RAGAgent")
+        if self.dax_cluster is not None:
+            self.rag_agent.add_environment("DAX_ENDPOINT", self.dax_cluster.attr_cluster_discovery_endpoint_url)
+
+        # SnapStart and provisioned concurrency only apply to published versions,
+        # so API traffic goes through an alias
+        self.rag_agent_alias = _lambda.Alias(
+            self,
+            "RagAgentLiveAlias",
+            alias_name="live",
+            version=self.rag_agent.current_version,
+            provisioned_concurrent_executions=provisioned_concurrency or None,
+        )
+        if provisioned_concurrency:
+            scaling = self.rag_agent_alias.add_auto_scaling(
+                min_capacity=provisioned_concurrency,
+                max_capacity=max(
+                    provisioned_concurrency,
+                    self._context_int("rag_agent_max_provisioned_concurrency", 10),
+                ),
+            )
+            scaling.scale_on_utilization(utilization_target=0.7)
 
         # API Gateway for the RAG pipeline
         self.api = apigateway.RestApi(
@@ -171,6 +309,7 @@ class RagPipelineStack(Stack):
                 allow_methods=apigateway.Cors.ALL_METHODS,
                 allow_headers=["Content-Type", "Authorization"],
             ),
+            deploy_options=apigateway.StageOptions(tracing_enabled=True),
         )
 
         # API endpoints
@@ -188,10 +327,27 @@ class RagPipelineStack(Stack):
             ],
         )
 
+        # Multipart upload handshake: clients PUT parts straight to S3 with
+        # presigned URLs, then POST /documents with "source": "upload"
+        uploads_resource = documents_resource.add_resource("uploads")
+        for resource in (uploads_resource, uploads_resource.add_resource("complete")):
+            resource.add_method(
+                "POST",
+                apigateway.LambdaIntegration(self.document_processor),
+                method_responses=[
+                    apigateway.MethodResponse(
+                        status_code="200",
+                        response_models={
+                            "application/json": apigateway.Model.EMPTY_MODEL
+                        },
+                    )
+                ],
+            )
+
         chat_resource = self.api.root.add_resource("chat")
         chat_resource.add_method(
             "POST",
-            apigateway.LambdaIntegration(self.rag_agent),
+            apigateway.LambdaIntegration(self.rag_agent_alias),
             method_responses=[
                 apigateway.MethodResponse(
                     status_code="200",
@@ -205,6 +361,136 @@ class RagPipelineStack(Stack):
         # Output important values
         self.add_outputs()
 
+    def _context_flag(self, name: str) -> bool:
+        """Read a boolean feature flag from CDK context (cdk.json or -c name=true)."""
+        return str(self.node.try_get_context(name)).lower() == "true"
+
+    def _context_int(self, name: str, default: int) -> int:
+        """Read an integer setting from CDK context, falling back to a default."""
+        value = self.node.try_get_context(name)
+        return int(value) if value is not None else default
+
+    def _lambda_architecture(self) -> _lambda.Architecture:
+        """Read the Lambda CPU architecture from CDK context (default arm64)."""
+        name = str(self.node.try_get_context("lambda_architecture") or "arm64").lower()
+        if name not in LAMBDA_ARCHITECTURES:
+            raise ValueError(f"lambda_architecture must be arm64 or x86_64, got {name}")
+        return LAMBDA_ARCHITECTURES[name]
+
+    def _table_billing_mode(self) -> dynamodb.BillingMode:
+        """Read the DynamoDB billing mode from CDK context (default PAY_PER_REQUEST)."""
+        mode = str(self.node.try_get_context("table_billing_mode") or "PAY_PER_REQUEST").upper()
+        if mode not in ("PAY_PER_REQUEST", "PROVISIONED"):
+            raise ValueError(f"table_billing_mode must be PAY_PER_REQUEST or PROVISIONED, got {mode}")
+        return dynamodb.BillingMode[mode]
+
+    def _auto_scale_table(self, table: dynamodb.Table) -> None:
+        """Scale a provisioned table's read and write capacity at 70% utilization."""
+        max_capacity = self._context_int("table_max_capacity", 200)
+        table.auto_scale_read_capacity(min_capacity=5, max_capacity=max_capacity).scale_on_utilization(
+            target_utilization_percent=70
+        )
+        table.auto_scale_write_capacity(min_capacity=5, max_capacity=max_capacity).scale_on_utilization(
+            target_utilization_percent=70
+        )
+
+    def _create_dax_cluster(self):
+        """Create a VPC and a DAX cluster caching reads of the conversation table.
+
+        The RAG agent Lambda joins the VPC's private subnets so it can reach the
+        cluster; NAT egress keeps Bedrock reachable, and gateway endpoints keep
+        S3 and DynamoDB traffic off the NAT gateway.
+        """
+        self.vpc = ec2.Vpc(
+            self,
+            "RagVpc",
+            max_azs=2,
+            nat_gateways=1,
+            gateway_endpoints={
+                "S3": ec2.GatewayVpcEndpointOptions(service=ec2.GatewayVpcEndpointAwsService.S3),
+                "DynamoDB": ec2.GatewayVpcEndpointOptions(service=ec2.GatewayVpcEndpointAwsService.DYNAMODB),
+            },
+        )
+
+        # The function role is passed in explicitly, so CDK won't add the
+        # permissions Lambda needs to create its network interfaces
+        self.lambda_role.add_managed_policy(
+            iam.ManagedPolicy.from_aws_managed_policy_name("service-role/AWSLambdaVPCAccessExecutionRole")
+        )
+
+        self.dax_client_security_group = ec2.SecurityGroup(
+            self,
+            "DaxClientSecurityGroup",
+            vpc=self.vpc,
+            description="RAG agent Lambda access to DAX",
+        )
+        dax_security_group = ec2.SecurityGroup(
+            self,
+            "DaxSecurityGroup",
+            vpc=self.vpc,
+            description="DAX cluster for the conversation table",
+            allow_all_outbound=False,
+        )
+        dax_security_group.add_ingress_rule(
+            self.dax_client_security_group,
+            ec2.Port.tcp(9111),
+            "DAX TLS endpoint from the RAG agent",
+        )
+
+        dax_role = iam.Role(
+            self,
+            "DaxServiceRole",
+            assumed_by=iam.ServicePrincipal("dax.amazonaws.com"),
+            description="Allows DAX to read and write the conversation table",
+        )
+        self.conversation_table.grant_read_write_data(dax_role)
+
+        subnet_group = dax.CfnSubnetGroup(
+            self,
+            "DaxSubnetGroup",
+            subnet_ids=self.vpc.select_subnets(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS).subnet_ids,
+            description="Private subnets for the conversation DAX cluster",
+        )
+
+        # Writes go straight to DynamoDB, which does not invalidate DAX's
+        # query cache, so cached history queries expire after 5 seconds (the
+        # same window as the Lambda's in-memory history cache) instead of 5 minutes
+        parameter_group = dax.CfnParameterGroup(
+            self,
+            "DaxParameterGroup",
+            description="Short query cache TTL for conversation history",
+            parameter_name_values={"query-ttl-millis": "5000"},
+        )
+
+        self.dax_cluster = dax.CfnCluster(
+            self,
+            "ConversationDaxCluster",
+            iam_role_arn=dax_role.role_arn,
+            node_type=self.node.try_get_context("dax_node_type") or "dax.r5.large",
+            replication_factor=1,
+            subnet_group_name=subnet_group.ref,
+            parameter_group_name=parameter_group.ref,
+            security_group_ids=[dax_security_group.security_group_id],
+            cluster_endpoint_encryption_type="TLS",
+            sse_specification=dax.CfnCluster.SSESpecificationProperty(sse_enabled=True),
+            description="Read-through cache for strands-rag-conversations",
+        )
+        Tags.of(self.dax_cluster).add("Purpose", "ConversationCache")
+
+        self.lambda_role.add_to_policy(
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=[
+                    "dax:GetItem",
+                    "dax:BatchGetItem",
+                    "dax:Query",
+                    "dax:PutItem",
+                    "dax:BatchWriteItem",
+                ],
+                resources=[self.dax_cluster.attr_arn],
+            )
+        )
+
     def add_outputs(self):
         """Add CloudFormation outputs for important resources."""
         CfnOutput(
@@ -3,16 +3,35 @@ Document Processor Lambda Function
 Processes uploaded documents and creates embeddings for RAG pipeline.
 """
 
+import codecs
+import io
 import json
+import math
+import re
 import boto3
 import os
-from typing import Dict, Any
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterable, Iterator, List, TextIO, Union
 
 # Import utilities
-from .utils import setup_logging, validate_environment_variables, create_response, create_error_response
+from .utils import (
+    AWS_CLIENT_CONFIG,
+    create_error_response,
+    create_response,
+    enable_tracing,
+    parse_request_body,
+    prewarm_tables,
+    setup_logging,
+    trace_subsegment,
+    validate_environment_variables,
+)
+from .embeddings import EMBEDDING_MODEL_ID, MAX_BATCH_SIZE, batched, content_hash, embed_texts
 
 # Configure logging
 logger = setup_logging()
+enable_tracing()
 
 # Validate and get environment variables at module load
 # Fail fast if environment is not configured correctly
@@ -25,11 +44,361 @@ DOCUMENT_BUCKET = env_vars['DOCUMENT_BUCKET']
 EMBEDDINGS_TABLE = env_vars['EMBEDDINGS_TABLE']
 
 # Initialize AWS clients
-s3_client = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
+s3_client = boto3.client('s3', config=AWS_CLIENT_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=AWS_CLIENT_CONFIG)
 embeddings_table = dynamodb.Table(EMBEDDINGS_TABLE)
 
 logger.info(f"Initialized with bucket: {DOCUMENT_BUCKET}, table: {EMBEDDINGS_TABLE}")
+prewarm_tables(dynamodb.meta.client, EMBEDDINGS_TABLE)
+
+# Constants
+CHUNK_SIZE = 1500
+CHUNK_OVERLAP = 200
+
+# Embeddings are also cached in the embeddings table under a key derived from
+# the chunk text, so unchanged content is never sent to Bedrock twice
+EMBEDDING_CACHE_PREFIX = 'embedding#'
+# Each document's chunk count is recorded under this prefix, so chunks left
+# over from a longer earlier version can be deleted when it is re-processed
+DOCUMENT_RECORD_PREFIX = 'document#'
+MAX_BATCH_GET_KEYS = 100
+# Throttled keys are retried a few times, then treated as cache misses
+MAX_BATCH_GET_ATTEMPTS = 3
+
+# Large documents are uploaded by the client straight to S3 in parallel
+# multipart parts, so the bytes never pass through Lambda or API Gateway
+UPLOAD_PREFIX = 'uploads/'
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+MAX_UPLOAD_PARTS = 10000
+UPLOAD_URL_EXPIRY_SECONDS = 3600
+
+# Uploaded documents are read through an 8 MiB buffer and chunked as they
+# stream in, while up to EMBED_WORKERS embedding requests run in the
+# background; at most MAX_PENDING_BATCHES are queued so reading cannot run
+# far ahead of embedding and writing
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+STREAM_READ_CHARS = 64 * 1024
+EMBED_WORKERS = 8
+MAX_PENDING_BATCHES = 16
+
+# Document IDs become S3 keys for uploads, so keep them to safe characters
+_DOCUMENT_ID_RE = re.compile(r'[A-Za-z0-9_.-]{1,256}')
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping chunks for embedding.
+    
+    Args:
+        text: Document text
+        chunk_size: Maximum characters per chunk
+        overlap: Characters shared between consecutive chunks
+        
+    Returns:
+        List of non-empty chunks
+    """
+    return list(iter_text_chunks(io.StringIO(text), chunk_size, overlap))
+
+
+def iter_text_chunks(stream: TextIO, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> Iterator[str]:
+    """Yield the chunks chunk_text would produce, reading text incrementally.
+    
+    Args:
+        stream: Text stream positioned at the start of the document
+        chunk_size: Maximum characters per chunk
+        overlap: Characters shared between consecutive chunks
+        
+    Returns:
+        Iterator over non-empty chunks
+    """
+    step = chunk_size - overlap
+    window = ""
+    eof = False
+    while True:
+        # Read past chunk_size so a window ending exactly at EOF is known to be last
+        while not eof and len(window) <= chunk_size:
+            data = stream.read(STREAM_READ_CHARS)
+            eof = not data
+            window += data
+        if not window:
+            return
+        chunk = window[:chunk_size].strip()
+        if chunk:
+            yield chunk
+        # Whatever follows the last full window is overlap already yielded
+        if eof and len(window) <= chunk_size:
+            return
+        window = window[step:]
+
+
+def fetch_cached_embeddings(hashes: Iterable[str]) -> Dict[str, bytes]:
+    """Look up previously computed embeddings by content hash.
+    
+    Args:
+        hashes: Content hashes to look up
+        
+    Returns:
+        Mapping of content hash to raw float32 embedding bytes for cache hits;
+        keys still unprocessed after MAX_BATCH_GET_ATTEMPTS count as misses
+    """
+    cached = {}
+    for batch in batched(hashes, MAX_BATCH_GET_KEYS):
+        request = {
+            EMBEDDINGS_TABLE: {
+                'Keys': [{'document_id': f"{EMBEDDING_CACHE_PREFIX}{h}"} for h in batch],
+                'ProjectionExpression': 'document_id, embedding',
+            }
+        }
+        for attempt in range(MAX_BATCH_GET_ATTEMPTS):
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response['Responses'].get(EMBEDDINGS_TABLE, []):
+                cached[item['document_id'][len(EMBEDDING_CACHE_PREFIX):]] = bytes(item['embedding'])
+            request = response.get('UnprocessedKeys')
+            if not request:
+                break
+            if attempt + 1 < MAX_BATCH_GET_ATTEMPTS:
+                time.sleep(0.05 * 2 ** attempt)
+        else:
+            logger.warning(f"{len(request[EMBEDDINGS_TABLE]['Keys'])} cached embeddings left unread")
+    return cached
+
+
+def _embed_missing(chunks: Dict[str, str], missing: List[str]) -> Dict[str, bytes]:
+    """Embed the chunks whose hashes are listed in missing."""
+    if not missing:
+        return {}
+    vectors = embed_texts([chunks[h] for h in missing])
+    return {h: vector.tobytes() for h, vector in zip(missing, vectors)}
+
+
+def _write_batch(batch, document_id: str, start_index: int, chunks: List[str], hashes: List[str],
+                 embeddings: Dict[str, bytes], embedded: Dict[str, bytes]) -> None:
+    """Queue chunk items, and cache entries for newly embedded chunks, on a batch writer."""
+    for index, (chunk, h) in enumerate(zip(chunks, hashes), start_index):
+        batch.put_item(
+            Item={
+                'document_id': f"{document_id}#{index:05d}",
+                'source_document_id': document_id,
+                'chunk_index': index,
+                'content': chunk,
+                'content_hash': h,
+                'embedding': embeddings[h],
+                'embedding_model': EMBEDDING_MODEL_ID,
+            }
+        )
+    for h, embedding in embedded.items():
+        batch.put_item(
+            Item={
+                'document_id': f"{EMBEDDING_CACHE_PREFIX}{h}",
+                'embedding': embedding,
+                'embedding_model': EMBEDDING_MODEL_ID,
+            }
+        )
+
+
+def process_document(document_id: str, content: Union[str, TextIO]) -> int:
+    """Chunk, embed, and store a document in the embeddings table.
+    
+    Chunks whose embedding is already cached (from an earlier upload or
+    another document with the same text) are not re-embedded; the rest are
+    embedded in batched Bedrock requests that run concurrently while the
+    document is still being read and earlier batches are written. Chunks
+    of an earlier, longer version of the document are deleted.
+    
+    Args:
+        document_id: Identifier of the source document
+        content: Document text, or a text stream to read it from
+        
+    Returns:
+        Number of chunks stored
+    """
+    stream = io.StringIO(content) if isinstance(content, str) else content
+    record_key = {'document_id': f"{DOCUMENT_RECORD_PREFIX}{document_id}"}
+    previous = embeddings_table.get_item(Key=record_key, ProjectionExpression='chunk_count').get('Item')
+    chunk_count = 0
+    embedded_count = 0
+    seen = set()
+    embeddings: Dict[str, bytes] = {}
+    pending: "deque[tuple]" = deque()
+    
+    # batch_writer groups puts into BatchWriteItem calls of up to 25 items
+    # and retries any unprocessed items
+    with embeddings_table.batch_writer() as batch, ThreadPoolExecutor(max_workers=EMBED_WORKERS) as pool:
+        def write_oldest() -> int:
+            # Batches are written in order, so hashes first seen in an
+            # earlier batch are already in embeddings by the time they're needed
+            start, chunks, hashes, cached, future = pending.popleft()
+            embedded = future.result()
+            embeddings.update(cached)
+            embeddings.update(embedded)
+            _write_batch(batch, document_id, start, chunks, hashes, embeddings, embedded)
+            return len(embedded)
+        
+        for chunks in batched(iter_text_chunks(stream), MAX_BATCH_SIZE):
+            hashes = [content_hash(chunk) for chunk in chunks]
+            new_chunks = {h: chunk for h, chunk in zip(hashes, chunks) if h not in seen}
+            seen.update(new_chunks)
+            # boto3 resources aren't thread-safe, so only embedding runs in the pool
+            cached = fetch_cached_embeddings(new_chunks)
+            missing = [h for h in new_chunks if h not in cached]
+            future: Future = pool.submit(_embed_missing, new_chunks, missing)
+            pending.append((chunk_count, chunks, hashes, cached, future))
+            chunk_count += len(chunks)
+            
+            if len(pending) >= MAX_PENDING_BATCHES:
+                embedded_count += write_oldest()
+        
+        while pending:
+            embedded_count += write_oldest()
+        
+        for index in range(chunk_count, int(previous['chunk_count']) if previous else 0):
+            batch.delete_item(Key={'document_id': f"{document_id}#{index:05d}"})
+        batch.put_item(Item={**record_key, 'chunk_count': chunk_count})
+    
+    logger.info(f"Embedded {embedded_count} of {chunk_count} chunks for {document_id}")
+    
+    return chunk_count
+
+
+def upload_key(document_id: str) -> str:
+    """S3 key a document's multipart upload is written to."""
+    return f"{UPLOAD_PREFIX}{document_id}"
+
+
+def start_upload(document_id: str, size: int) -> Dict[str, Any]:
+    """Start a multipart upload and presign a URL for each part.
+    
+    Args:
+        document_id: Identifier of the document being uploaded
+        size: Document size in bytes
+        
+    Returns:
+        Upload ID, object key, part size, and presigned part URLs in part order
+    """
+    key = upload_key(document_id)
+    part_count = max(1, math.ceil(size / UPLOAD_PART_SIZE))
+    upload = s3_client.create_multipart_upload(Bucket=DOCUMENT_BUCKET, Key=key)
+    part_urls = [
+        s3_client.generate_presigned_url(
+            'upload_part',
+            Params={
+                'Bucket': DOCUMENT_BUCKET,
+                'Key': key,
+                'UploadId': upload['UploadId'],
+                'PartNumber': part_number,
+            },
+            ExpiresIn=UPLOAD_URL_EXPIRY_SECONDS,
+        )
+        for part_number in range(1, part_count + 1)
+    ]
+    return {
+        'upload_id': upload['UploadId'],
+        'key': key,
+        'part_size': UPLOAD_PART_SIZE,
+        'part_urls': part_urls,
+    }
+
+
+def complete_upload(document_id: str, upload_id: str, parts: List[Dict[str, Any]]) -> str:
+    """Assemble uploaded parts into the document object.
+    
+    Args:
+        document_id: Identifier of the document being uploaded
+        upload_id: Upload ID returned by start_upload
+        parts: PartNumber and ETag of each uploaded part
+        
+    Returns:
+        Key of the assembled object
+    """
+    key = upload_key(document_id)
+    s3_client.complete_multipart_upload(
+        Bucket=DOCUMENT_BUCKET,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={
+            'Parts': [
+                {'PartNumber': int(part['PartNumber']), 'ETag': part['ETag']}
+                for part in sorted(parts, key=lambda part: int(part['PartNumber']))
+            ]
+        },
+    )
+    return key
+
+
+class _RawBody(io.RawIOBase):
+    """Raw stream over an S3 StreamingBody, which io.BufferedReader can wrap.
+    
+    StreamingBody only gained readinto() in recent botocore versions.
+    """
+    
+    def __init__(self, body):
+        self._body = body
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        data = self._body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+    
+    def close(self) -> None:
+        if not self.closed:
+            self._body.close()
+        super().close()
+
+
+def read_uploaded_document(document_id: str) -> TextIO:
+    """Open a document previously uploaded with start_upload/complete_upload.
+    
+    Raises:
+        UnicodeDecodeError: If the start of the document isn't UTF-8 text
+            (a PDF, for example); the stream is closed first
+    
+    Returns:
+        UTF-8 text stream over the S3 object, buffered so slow consumers
+        downstream don't stall the S3 read one small chunk at a time
+    """
+    response = s3_client.get_object(Bucket=DOCUMENT_BUCKET, Key=upload_key(document_id))
+    reader = io.BufferedReader(_RawBody(response['Body']), buffer_size=READ_BUFFER_SIZE)
+    try:
+        # Check the first buffer before anything is embedded or stored
+        codecs.getincrementaldecoder('utf-8')().decode(reader.peek(READ_BUFFER_SIZE))
+    except UnicodeDecodeError:
+        reader.close()
+        raise
+    return io.TextIOWrapper(reader, encoding='utf-8')
+
+
+def handle_upload_request(resource: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    """Handle POST /documents/uploads and POST /documents/uploads/complete."""
+    document_id = body.get('document_id')
+    if not isinstance(document_id, str) or not _DOCUMENT_ID_RE.fullmatch(document_id):
+        return create_error_response(
+            400,
+            'invalid_request',
+            'document_id is required (letters, digits, ".", "-" and "_" only)'
+        )
+    
+    if resource.endswith('/complete'):
+        upload_id = body.get('upload_id')
+        parts = body.get('parts')
+        if not isinstance(upload_id, str) or not isinstance(parts, list) or not parts:
+            return create_error_response(
+                400,
+                'invalid_request',
+                'upload_id and parts are required'
+            )
+        key = complete_upload(document_id, upload_id, parts)
+        return create_response(200, {'document_id': document_id, 'key': key, 'status': 'uploaded'})
+    
+    size = body.get('size')
+    if not isinstance(size, int) or size <= 0 or size > UPLOAD_PART_SIZE * MAX_UPLOAD_PARTS:
+        return create_error_response(
+            400,
+            'invalid_request',
+            f'size must be a positive number of bytes up to {UPLOAD_PART_SIZE * MAX_UPLOAD_PARTS}'
+        )
+    return create_response(200, start_upload(document_id, size))
 
 
 def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
@@ -45,7 +414,7 @@ def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     try:
         # Parse request body
-        body = json.loads(event.get('body', '{}'))
+        body = parse_request_body(event)
         
         # Validate input
         if not body:
@@ -55,18 +424,46 @@ def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
                 'Request body is required'
             )
         
-        logger.info(f"Processing document request: {body.get('document_id', 'unknown')}")
+        resource = event.get('resource', '/documents')
+        if resource.startswith('/documents/uploads'):
+            return handle_upload_request(resource, body)
+        
+        document_id = body.get('document_id')
+        content = body.get('content')
         
-        # For now, return a simple response
-        # In a full implementation, this would:
-        # 1. Extract text from uploaded documents
-        # 2. Create embeddings using Bedrock
-        # 3. Store embeddings metadata in DynamoDB
-        # 4. Store processed documents in S3
+        # Documents uploaded through /documents/uploads are read back from S3
+        if (body.get('source') == 'upload' and isinstance(document_id, str)
+                and _DOCUMENT_ID_RE.fullmatch(document_id)):
+            try:
+                content = read_uploaded_document(document_id)
+            except s3_client.exceptions.NoSuchKey:
+                return create_error_response(
+                    404,
+                    'not_found',
+                    'No completed upload found for this document_id'
+                )
+        
+        if not isinstance(document_id, str) or not document_id or not isinstance(content, (str, io.TextIOBase)):
+            return create_error_response(
+                400,
+                'invalid_request',
+                'document_id and content are required'
+            )
+        
+        logger.info(f"Processing document request: {document_id}")
+        
+        try:
+            with trace_subsegment('process_document'):
+                chunk_count = process_document(document_id, content)
+        finally:
+            # Release the S3 connection even if processing fails midway
+            if isinstance(content, io.TextIOBase):
+                content.close()
         
         response_body = {
-            'message': 'Document processing endpoint ready',
-            'bucket': DOCUMENT_BUCKET,
+            'message': 'Document processed',
+            'document_id': document_id,
+            'chunks': chunk_count,
             'table': EMBEDDINGS_TABLE,
             'status': 'success'
         }
@@ -80,6 +477,14 @@ def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
             'invalid_json',
             'The request body must be valid JSON'
         )
+    
+    except UnicodeDecodeError as e:
+        logger.error(f"Uploaded document is not UTF-8 text: {str(e)}")
+        return create_error_response(
+            400,
+            'unsupported_document',
+            'Uploaded documents must be UTF-8 text'
+        )
         
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}", exc_info=True)
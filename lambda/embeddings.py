@@ -0,0 +1,75 @@
+"""
+Embedding helpers for Lambda functions.
+Calls the Amazon Bedrock embedding model in batched requests.
+"""
+
+import hashlib
+import os
+from itertools import islice
+from typing import Iterable, List, Sequence
+
+import boto3
+import numpy as np
+
+from .utils import BEDROCK_CLIENT_CONFIG, json_dumps, json_loads
+
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "cohere.embed-english-v3")
+
+# Largest number of texts Cohere Embed accepts in a single request
+MAX_BATCH_SIZE = 96
+
+bedrock_runtime = boto3.client('bedrock-runtime', config=BEDROCK_CLIENT_CONFIG)
+
+
+def batched(items: Iterable, size: int) -> Iterable[List]:
+    """Yield consecutive lists of at most size items.
+
+    Args:
+        items: Items to group
+        size: Maximum group size
+
+    Returns:
+        Iterator over lists of items
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def content_hash(text: str) -> str:
+    """Hash a text together with the embedding model that would embed it."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL_ID}\n{text}".encode('utf-8')).hexdigest()
+
+
+def _embed_batch(texts: List[str], input_type: str) -> np.ndarray:
+    """Embed one request's worth of texts."""
+    response = bedrock_runtime.invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        contentType='application/json',
+        accept='application/json',
+        body=json_dumps({
+            'texts': texts,
+            'input_type': input_type,
+            'truncate': 'END',
+        }),
+    )
+    payload = json_loads(response['body'].read())
+    return np.asarray(payload['embeddings'], dtype=np.float32)
+
+
+def embed_texts(texts: Sequence[str], input_type: str = "search_document") -> np.ndarray:
+    """Embed texts with one Bedrock request per batch of MAX_BATCH_SIZE.
+
+    Args:
+        texts: Texts to embed
+        input_type: "search_document" for corpus chunks, "search_query" for queries
+
+    Returns:
+        Float32 array of shape (len(texts), dimension)
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.vstack([_embed_batch(batch, input_type) for batch in batched(texts, MAX_BATCH_SIZE)])
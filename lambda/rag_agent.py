@@ -5,22 +5,82 @@ Main Strands agent for handling RAG queries with conversation context.
 
 import json
 import boto3
+import numpy as np
 import os
-import re
-from typing import Dict, Any
-from datetime import datetime
-from boto3.dynamodb.conditions import Key
+import string
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional
+from functools import lru_cache
+
+from botocore.exceptions import BotoCoreError, ClientError
 
 # Import utilities
-from .utils import setup_logging, validate_environment_variables, create_response, create_error_response
+from .utils import (
+    AWS_CLIENT_CONFIG,
+    BEDROCK_CLIENT_CONFIG,
+    create_error_response,
+    create_response,
+    enable_tracing,
+    parse_request_body,
+    prewarm_tables,
+    setup_logging,
+    trace_subsegment,
+    validate_environment_variables,
+)
+from .embeddings import EMBEDDING_MODEL_ID, batched, content_hash, embed_texts
+from . import vector_store
 
 # Configure logging
 logger = setup_logging()
+enable_tracing()
 
 # Constants
 MAX_MESSAGE_LENGTH = 10000
+# Bodies longer than this are rejected before parsing: room for a maximum
+# length message even if every character is escaped as \uXXXX, plus the
+# other fields
+MAX_REQUEST_BODY_LENGTH = 6 * MAX_MESSAGE_LENGTH + 1024
 MAX_SANITIZE_LENGTH = 50000
 MAX_CONVERSATION_ID_LENGTH = 256
+CONVERSATION_ID_CHARS = frozenset(string.ascii_letters + string.digits + '_-')
+SEARCH_TOP_K = 3
+
+# BatchWriteItem accepts up to 25 puts; throttled leftovers are retried a few
+# times before the save is reported as failed
+MAX_BATCH_WRITE_ITEMS = 25
+MAX_BATCH_WRITE_ATTEMPTS = 3
+
+# Repeated history lookups for a conversation within this window (e.g. several
+# tool calls in one agent turn) are served from memory; messages saved by this
+# execution environment invalidate its cached entry immediately
+HISTORY_CACHE_SECONDS = 5
+HISTORY_CACHE_SIZE = 256
+# Messages of context read per history lookup, newest first; one query page
+HISTORY_MESSAGE_LIMIT = 10
+
+# Query embeddings are cached in the embeddings table so repeated questions
+# skip Bedrock; entries expire through the table's TTL attribute
+QUERY_CACHE_PREFIX = 'query#'
+QUERY_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Recent query embeddings are also kept in memory, in front of the table
+QUERY_CACHE_SIZE = 256
+MAX_BATCH_GET_KEYS = 100
+
+# python_repl adds noticeably to cold-start imports and memory, so it is only
+# registered when the function is deployed with ENABLE_REPL=1
+ENABLE_REPL = os.getenv("ENABLE_REPL") == "1"
+
+# The tool specs and system prompt are identical on every request, so each
+# gets a Bedrock prompt cache point and only the conversation after them is
+# processed afresh. Bedrock ignores a cache point whose prefix is shorter than
+# the model's minimum (1,024 tokens for Claude Sonnet, 2,048 for Claude 3.5
+# Haiku). Measured with strands-agents-tools 0.8.9, the tool specs come to
+# about 10,500 characters (the calculator spec alone is ~6,800), roughly
+# 2,400 tokens, and the system prompt adds ~170, so both cache points clear
+# the Sonnet minimum. Deploy with PROMPT_CACHE=0 for models without prompt
+# caching or with a larger minimum
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "1") == "1"
 
 # Validate and get environment variables at module load
 # Fail fast if environment is not configured correctly
@@ -34,15 +94,54 @@ DOCUMENT_BUCKET = env_vars['DOCUMENT_BUCKET']
 CONVERSATION_TABLE = env_vars['CONVERSATION_TABLE']
 EMBEDDINGS_TABLE = env_vars['EMBEDDINGS_TABLE']
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-s3_client = boto3.client('s3')
+# Set by the stack when it is deployed with enable_dax=true
+DAX_ENDPOINT = os.getenv('DAX_ENDPOINT')
 
-# Initialize DynamoDB tables
-conversation_table = dynamodb.Table(CONVERSATION_TABLE)
-embeddings_table = dynamodb.Table(EMBEDDINGS_TABLE)
+# Initialize AWS clients. DynamoDB goes through the low-level client: the
+# resource API loads its own model at import and wraps every attribute.
+dynamodb_client = boto3.client('dynamodb', config=AWS_CLIENT_CONFIG)
+s3_client = boto3.client('s3', config=AWS_CLIENT_CONFIG)
 
 logger.info(f"Initialized with bucket: {DOCUMENT_BUCKET}, tables: {CONVERSATION_TABLE}, {EMBEDDINGS_TABLE}")
+prewarm_tables(dynamodb_client, CONVERSATION_TABLE)
+
+_dax_client = None
+
+_last_timestamp_us = 0
+
+# Normalized query -> embedding, least recently used first
+_query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+# Latest message timestamp saved per conversation, part of the history cache key
+_saved_timestamps: "OrderedDict[str, str]" = OrderedDict()
+
+# Load the document index during INIT so warm invocations and SnapStart
+# snapshots already have it; search_documents retries lazily if this fails
+if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+    try:
+        vector_store.load_index(DOCUMENT_BUCKET)
+    except Exception as e:
+        logger.warning(f"Document index not loaded at startup: {str(e)}")
+
+
+class _SanitizeTable(dict):
+    """str.translate table that drops non-printable characters except newlines.
+    
+    Entries are filled in the first time a code point is seen, so repeated
+    characters are looked up in C instead of calling isprintable() per char.
+    Only the Basic Multilingual Plane is cached, which bounds the table size.
+    """
+    
+    def __missing__(self, code_point: int):
+        char = chr(code_point)
+        keep = char == '\n' or (char.isprintable() and char != '\t')
+        value = code_point if keep else None
+        if code_point < 0x10000:
+            self[code_point] = value
+        return value
+
+
+_SANITIZE_TABLE = _SanitizeTable()
 
 
 def sanitize_input(text: str, max_length: int = MAX_SANITIZE_LENGTH) -> str:
@@ -61,15 +160,19 @@ def sanitize_input(text: str, max_length: int = MAX_SANITIZE_LENGTH) -> str:
     # Strip leading/trailing whitespace
     text = text.strip()
     
-    # Remove any control characters and tabs (for security)
-    # Only allow printable characters and newlines
-    sanitized = ''.join(char for char in text if (char.isprintable() and char != '\t') or char == '\n')
+    # Limit length to prevent resource exhaustion; truncating before
+    # translating bounds the work for oversized input
+    if len(text) > max_length:
+        text = text[:max_length]
     
-    # Limit length to prevent resource exhaustion
-    if len(sanitized) > max_length:
-        sanitized = sanitized[:max_length]
+    # Most messages are a single line with nothing to remove, which
+    # isprintable() confirms in C without building a new string
+    if text.isprintable():
+        return text
     
-    return sanitized
+    # Remove any control characters and tabs (for security)
+    # Only allow printable characters and newlines
+    return text.translate(_SANITIZE_TABLE)
 
 
 def validate_conversation_id(conversation_id: str) -> bool:
@@ -84,81 +187,227 @@ def validate_conversation_id(conversation_id: str) -> bool:
     if not conversation_id or not isinstance(conversation_id, str):
         return False
     
-    # Allow alphanumeric, hyphens, and underscores only
-    if not re.match(r'^[a-zA-Z0-9_-]+$', conversation_id):
-        return False
-    
-    # Check length
+    # Check length first so oversized IDs are rejected without scanning them
     if len(conversation_id) > MAX_CONVERSATION_ID_LENGTH:
         return False
     
-    return True
+    # Allow alphanumeric, hyphens, and underscores only
+    return CONVERSATION_ID_CHARS.issuperset(conversation_id)
+
+
+def history_client():
+    """Return the client for conversation history reads.
+    
+    Reads go through DAX when DAX_ENDPOINT is set, falling back to DynamoDB
+    if the DAX client can't be created. The DAX client connects on creation,
+    so it is created on first use rather than during INIT (and so never ends
+    up in a SnapStart snapshot with stale connections).
+    
+    Returns:
+        DAX client, or the low-level DynamoDB client
+    """
+    global _dax_client
+    if not DAX_ENDPOINT:
+        return dynamodb_client
+    if _dax_client is None:
+        try:
+            from amazondax import AmazonDaxClient
+            _dax_client = AmazonDaxClient(endpoint_url=DAX_ENDPOINT)
+        except Exception as e:
+            logger.warning(f"DAX unavailable, reading history from DynamoDB: {str(e)}")
+            return dynamodb_client
+    return _dax_client
+
+
+@lru_cache(maxsize=HISTORY_CACHE_SIZE)
+def _fetch_history(conversation_id: str, last_saved: Optional[str], ttl_bucket: int) -> str:
+    """Query and format conversation history.
+    
+    last_saved and ttl_bucket only form part of the cache key: a new save or
+    the next time bucket makes the cached entry unreachable.
+    """
+    response = history_client().query(
+        TableName=CONVERSATION_TABLE,
+        KeyConditionExpression='conversation_id = :cid',
+        ExpressionAttributeValues={':cid': {'S': conversation_id}},
+        # Newest first, so Limit keeps the most recent messages
+        ScanIndexForward=False,
+        Limit=HISTORY_MESSAGE_LIMIT,
+        # Only role and content are used; role is a reserved word
+        ProjectionExpression='#role, content',
+        ExpressionAttributeNames={'#role': 'role'},
+        # Eventually consistent reads cost half the read capacity
+        ConsistentRead=False,
+    )
+
+    return "\n".join(
+        f"{item['role']['S']}: {item['content']['S']}" for item in reversed(response.get('Items', []))
+    ) or "No previous conversation history."
 
 
 def fetch_conversation_history(conversation_id: str) -> str:
     """Retrieve recent conversation history for context."""
     try:
-        response = conversation_table.query(
-            KeyConditionExpression=Key("conversation_id").eq(conversation_id),
-            ScanIndexForward=True,
-            Limit=10,
+        return _fetch_history(
+            conversation_id,
+            _saved_timestamps.get(conversation_id),
+            int(time.time() // HISTORY_CACHE_SECONDS),
         )
+    except (BotoCoreError, ClientError) as e:
+        # Only AWS failures are expected here; anything else is a bug
+        logger.error(f"Error retrieving conversation history: {str(e)}")
+        return "Error retrieving conversation history."
 
-        messages = []
-        for item in response.get('Items', []):
-            messages.append(f"{item['role']}: {item['content']}")
 
-        return "\n".join(messages) if messages else "No previous conversation history."
+def normalize_query(query: str) -> str:
+    """Lowercase a query and collapse its whitespace so trivial variants share an embedding."""
+    return ' '.join(query.lower().split())
+
+
+def embed_query(query: str) -> np.ndarray:
+    """Embed a single search query; see embed_queries.
+    
+    Args:
+        query: Search query text
+        
+    Returns:
+        Float32 query embedding (read-only)
+    """
+    return embed_queries([query])[0]
+
 
+def embed_queries(queries: List[str]) -> np.ndarray:
+    """Embed search queries, reusing cached embeddings where they exist.
+    
+    Queries are normalized first, then looked up in memory, then in the
+    embeddings table (shared by all execution environments). Whatever is
+    left is embedded with a single Bedrock request, so several sub-queries
+    cost about as much as one. Table reads and writes are best-effort: if
+    DynamoDB fails the queries are still embedded with Bedrock.
+    
+    Args:
+        queries: Search query texts
+        
+    Returns:
+        Read-only float32 array of shape (len(queries), dimension), usable
+        directly as a FAISS query matrix
+    """
+    normalized = [normalize_query(query) for query in queries]
+    embeddings = {}
+    for query in dict.fromkeys(normalized):
+        if query in _query_embeddings:
+            _query_embeddings.move_to_end(query)
+            embeddings[query] = _query_embeddings[query]
+    
+    missing = [query for query in dict.fromkeys(normalized) if query not in embeddings]
+    if missing:
+        cached = _fetch_cached_query_embeddings(missing)
+        embeddings.update(cached)
+        missing = [query for query in missing if query not in cached]
+    if missing:
+        embedded = dict(zip(missing, embed_texts(missing, input_type="search_query")))
+        embeddings.update(embedded)
+        _store_query_embeddings(embedded)
+    
+    for query in dict.fromkeys(normalized):
+        _query_embeddings[query] = embeddings[query]
+        _query_embeddings.move_to_end(query)
+    while len(_query_embeddings) > QUERY_CACHE_SIZE:
+        _query_embeddings.popitem(last=False)
+    
+    result = np.vstack([embeddings[query] for query in normalized])
+    result.flags.writeable = False
+    return result
+
+
+def _query_cache_key(query: str) -> Dict[str, Dict[str, str]]:
+    """Embeddings table key for a normalized query."""
+    return {'document_id': {'S': f"{QUERY_CACHE_PREFIX}{content_hash(query)}"}}
+
+
+def _fetch_cached_query_embeddings(queries: List[str]) -> Dict[str, np.ndarray]:
+    """Look up unexpired query embeddings made by EMBEDDING_MODEL_ID in the embeddings table."""
+    by_key = {_query_cache_key(query)['document_id']['S']: query for query in queries}
+    found = {}
+    try:
+        for keys in batched(by_key, MAX_BATCH_GET_KEYS):
+            response = dynamodb_client.batch_get_item(
+                RequestItems={EMBEDDINGS_TABLE: {'Keys': [{'document_id': {'S': key}} for key in keys]}}
+            )
+            for item in response['Responses'].get(EMBEDDINGS_TABLE, []):
+                # Vectors from another model don't share this index's space
+                if item.get('embedding_model', {}).get('S') != EMBEDDING_MODEL_ID:
+                    continue
+                if int(item['ttl']['N']) > time.time():
+                    query = by_key[item['document_id']['S']]
+                    found[query] = np.frombuffer(item['embedding']['B'], dtype=np.float32)
     except Exception as e:
-        logger.error(f"Error retrieving conversation history: {str(e)}")
-        return "Error retrieving conversation history."
+        logger.warning(f"Query embedding cache lookup failed: {str(e)}")
+    return found
 
 
-def create_rag_agent():
-    """Create and configure the Strands RAG agent."""
+def _store_query_embeddings(embeddings: Dict[str, np.ndarray]) -> None:
+    """Write new query embeddings to the embeddings table with an expiry."""
+    expires = str(int(time.time()) + QUERY_CACHE_TTL_SECONDS)
+    requests = [
+        {'PutRequest': {'Item': {
+            **_query_cache_key(query),
+            'embedding': {'B': embedding.tobytes()},
+            'embedding_model': {'S': EMBEDDING_MODEL_ID},
+            'ttl': {'N': expires},
+        }}}
+        for query, embedding in embeddings.items()
+    ]
     try:
-        from strands import Agent, tool
-        from strands_tools import calculator, python_repl, http_request
-        
-        @tool
-        def search_documents(query: str) -> str:
-            """Search through uploaded documents for relevant information.
-            
-            Args:
-                query: The search query to find relevant documents
-                
-            Returns:
-                Relevant document excerpts or information
-            """
-            # In a full implementation, this would:
-            # 1. Create embeddings for the query
-            # 2. Search vector database for similar documents
-            # 3. Return relevant excerpts
-            
-            return f"Document search results for '{query}': This is a placeholder. In the full implementation, this would return relevant document excerpts based on semantic similarity."
+        # Unprocessed items are dropped; they'd only cost a later cache miss
+        for batch in batched(requests, MAX_BATCH_WRITE_ITEMS):
+            dynamodb_client.batch_write_item(RequestItems={EMBEDDINGS_TABLE: batch})
+    except Exception as e:
+        logger.warning(f"Could not cache query embeddings: {str(e)}")
+
+
+def search_documents(query: str) -> str:
+    """Search through uploaded documents for relevant information.
+    
+    Args:
+        query: The search query to find relevant documents
         
-        @tool
-        def get_conversation_history(conversation_id: str) -> str:
-            """Retrieve conversation history for context.
-            
-            Args:
-                conversation_id: Unique identifier for the conversation
-                
-            Returns:
-                Previous conversation messages
-            """
-            return fetch_conversation_history(conversation_id)
+    Returns:
+        Relevant document excerpts or information
+    """
+    try:
+        query_embedding = embed_query(query)
+        results = vector_store.search(DOCUMENT_BUCKET, query_embedding, SEARCH_TOP_K)
+    except Exception as e:
+        logger.error(f"Error searching documents: {str(e)}", exc_info=True)
+        return "Document search is currently unavailable."
+    
+    if not results:
+        return f"No documents found matching '{query}'."
+    
+    return "Found relevant information:\n" + "\n\n".join(
+        f"[{chunk['document_id']}] {chunk['content']}" for _, chunk in results
+    )
+
+
+def get_conversation_history(conversation_id: str) -> str:
+    """Retrieve conversation history for context.
+    
+    Args:
+        conversation_id: Unique identifier for the conversation
         
-        # Create the agent with custom RAG tools
-        agent = Agent(
-            tools=[search_documents, get_conversation_history, calculator, python_repl, http_request],
-            system_prompt="""You are an intelligent RAG (Retrieval-Augmented Generation) assistant built with Strands agents. 
+    Returns:
+        Previous conversation messages
+    """
+    return fetch_conversation_history(conversation_id)
+
+
+RAG_SYSTEM_PROMPT = f"""You are an intelligent RAG (Retrieval-Augmented Generation) assistant built with Strands agents. 
 
 Your capabilities include:
 - Searching through uploaded documents to find relevant information
 - Maintaining conversation context across multiple interactions
-- Performing calculations and running Python code when needed
+- Performing calculations{" and running Python code" if ENABLE_REPL else ""} when needed
 - Making HTTP requests to external APIs when necessary
 
 When users ask questions:
@@ -168,18 +417,115 @@ When users ask questions:
 4. If you need to perform calculations or analysis, use the appropriate tools
 
 Always be helpful, accurate, and cite your sources when referencing document content."""
-        )
+
+
+def create_rag_agent():
+    """Create and configure the Strands RAG agent.
+    
+    Records the failure in AGENT_INIT_ERROR when the agent can't be built.
+    """
+    global AGENT_INIT_ERROR
+    try:
+        from strands import Agent, tool
+        from strands.models import BedrockModel
+        from strands_tools import calculator, http_request
         
-        return agent
+        tools = [tool(search_documents), tool(get_conversation_history), calculator, http_request]
+        if ENABLE_REPL:
+            from strands_tools import python_repl
+            tools.append(python_repl)
+        
+        # Create the agent with custom RAG tools. The default callback handler
+        # prints every streamed token, which in Lambda only writes them to logs.
+        return Agent(
+            model=BedrockModel(
+                boto_client_config=BEDROCK_CLIENT_CONFIG,
+                cache_prompt='default' if PROMPT_CACHE else None,
+                cache_tools='default' if PROMPT_CACHE else None,
+            ),
+            tools=tools,
+            system_prompt=RAG_SYSTEM_PROMPT,
+            callback_handler=None,
+        )
         
     except ImportError as e:
         logger.error(f"Error importing Strands: {str(e)}")
+        AGENT_INIT_ERROR = e
         return None
     except Exception as e:
         logger.error(f"Error creating agent: {str(e)}")
+        AGENT_INIT_ERROR = e
         return None
 
 
+# Build the agent once per execution environment, during INIT, so warm
+# invocations skip the Strands imports and tool registration
+AGENT_INIT_ERROR = None
+AGENT = create_rag_agent()
+
+
+def get_agent():
+    """Return the shared RAG agent, ready for a new request.
+    
+    The agent is reused across invocations, so the messages left over from
+    the previous request are cleared; conversation context is loaded from
+    DynamoDB through get_conversation_history instead.
+    
+    A failed build is retried on the next request, except when Strands
+    itself is missing: that can't change within an execution environment,
+    so retrying would only repeat the failing imports on every request.
+    
+    Returns:
+        Strands agent, or None if it could not be created
+    """
+    global AGENT
+    if AGENT is None and not isinstance(AGENT_INIT_ERROR, ImportError):
+        AGENT = create_rag_agent()
+    if AGENT is not None:
+        AGENT.messages = []
+    return AGENT
+
+
+def next_timestamp() -> str:
+    """Return the current UTC time as an ISO timestamp, later than any returned before.
+    
+    Messages are keyed by (conversation_id, timestamp), so two messages
+    stamped within the same microsecond would overwrite each other.
+    
+    Returns:
+        ISO format timestamp with microseconds
+    """
+    global _last_timestamp_us
+    _last_timestamp_us = max(time.time_ns() // 1000, _last_timestamp_us + 1)
+    seconds, micros = divmod(_last_timestamp_us, 1_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{micros:06d}"
+
+
+def conversation_item(conversation_id: str, role: str, content: str, timestamp: str) -> Dict[str, str]:
+    """Build a conversation table item for one message."""
+    return {
+        'conversation_id': conversation_id,
+        'timestamp': timestamp,
+        'role': role,
+        'content': content
+    }
+
+
+def marshal_item(item: Dict[str, str]) -> Dict[str, Dict[str, str]]:
+    """Convert a conversation item to DynamoDB AttributeValue form."""
+    return {name: {'S': value} for name, value in item.items()}
+
+
+def _record_saved(items: Iterable[Dict[str, str]]) -> None:
+    """Invalidate cached history for the conversations items were saved to."""
+    for item in items:
+        conversation_id = item['conversation_id']
+        latest = max(item['timestamp'], _saved_timestamps.pop(conversation_id, ''))
+        _saved_timestamps[conversation_id] = latest
+    while len(_saved_timestamps) > HISTORY_CACHE_SIZE:
+        _saved_timestamps.popitem(last=False)
+
+
 def save_conversation_message(conversation_id: str, role: str, content: str, timestamp: str) -> bool:
     """Save a conversation message to DynamoDB.
     
@@ -192,21 +538,50 @@ def save_conversation_message(conversation_id: str, role: str, content: str, tim
     Returns:
         True if save succeeded, False otherwise
     """
+    item = conversation_item(conversation_id, role, content, timestamp)
     try:
-        conversation_table.put_item(
-            Item={
-                'conversation_id': conversation_id,
-                'timestamp': timestamp,
-                'role': role,
-                'content': content
-            }
-        )
+        dynamodb_client.put_item(TableName=CONVERSATION_TABLE, Item=marshal_item(item))
+        _record_saved([item])
         return True
     except Exception as e:
         logger.error(f"Error saving conversation message: {str(e)}", exc_info=True)
         return False
 
 
+def save_conversation_messages(items: List[Dict[str, str]]) -> bool:
+    """Save several conversation messages with batched DynamoDB writes.
+    
+    Args:
+        items: Items built with conversation_item
+        
+    Returns:
+        True if save succeeded, False otherwise
+    """
+    # A repeated key keeps the last item, as consecutive puts would;
+    # BatchWriteItem rejects duplicate keys within one request
+    unique = {(item['conversation_id'], item['timestamp']): item for item in items}
+    requests = [{'PutRequest': {'Item': marshal_item(item)}} for item in unique.values()]
+    
+    try:
+        # One BatchWriteItem round trip per 25 items instead of one PutItem each
+        for batch in batched(requests, MAX_BATCH_WRITE_ITEMS):
+            pending = {CONVERSATION_TABLE: batch}
+            for attempt in range(MAX_BATCH_WRITE_ATTEMPTS):
+                pending = dynamodb_client.batch_write_item(RequestItems=pending).get('UnprocessedItems')
+                if not pending:
+                    break
+                time.sleep(0.05 * 2 ** attempt)
+            else:
+                raise RuntimeError(f"{len(pending[CONVERSATION_TABLE])} messages left unprocessed")
+        return True
+    except Exception as e:
+        logger.error(f"Error saving conversation messages: {str(e)}", exc_info=True)
+        return False
+    finally:
+        # Earlier batches may have been written even if a later one failed
+        _record_saved(unique.values())
+
+
 def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     """
     Lambda handler for RAG agent queries.
@@ -219,8 +594,16 @@ def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         API Gateway response
     """
     try:
+        # Reject oversized bodies without parsing them
+        if len(event.get('body') or '') > MAX_REQUEST_BODY_LENGTH:
+            return create_error_response(
+                400,
+                'message_too_long',
+                f'Message is too long (max {MAX_MESSAGE_LENGTH} characters)'
+            )
+        
         # Parse request body
-        body = json.loads(event.get('body', '{}'))
+        body = parse_request_body(event)
         user_message = body.get('message', '')
         conversation_id = body.get('conversation_id', 'default')
         
@@ -254,23 +637,24 @@ def handler(event: Dict[str, Any], context) -> Dict[str, Any]:
         logger.info(f"Processing message from conversation {conversation_id}")
         
         # Create timestamp
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Save user message
-        save_conversation_message(conversation_id, 'user', user_message, timestamp)
+        timestamp = next_timestamp()
         
-        # Create and use the RAG agent
-        agent = create_rag_agent()
+        # Use the RAG agent built at INIT
+        agent = get_agent()
         
         if agent is None:
             # Fallback response if agent creation fails
             response_message = f"RAG Agent is initializing. Your message was: '{user_message}'. This is a basic response while the full Strands agent is being set up."
         else:
             # Use the agent to process the message
-            response_message = agent(user_message)
+            with trace_subsegment('agent_invoke'):
+                response_message = str(agent(user_message))
         
-        # Save agent response
-        save_conversation_message(conversation_id, 'assistant', response_message, timestamp)
+        # Save both sides of the exchange in one batched write
+        save_conversation_messages([
+            conversation_item(conversation_id, 'user', user_message, timestamp),
+            conversation_item(conversation_id, 'assistant', response_message, next_timestamp()),
+        ])
         
         response_body = {
             'message': response_message,
@@ -3,9 +3,60 @@ Common utilities for Lambda functions.
 Provides logging, validation, and helper functions.
 """
 
+import json
 import os
 import logging
-from typing import Optional, Dict, Any
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Optional, Dict, Any, ContextManager, Union
+
+from botocore.config import Config
+
+# orjson is bundled with the Lambda assets; fall back to the stdlib when it is
+# missing (e.g. local test runs). orjson.JSONDecodeError subclasses
+# json.JSONDecodeError, so callers can catch the stdlib exception either way.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# The X-Ray SDK is bundled with the Lambda assets; without it (e.g. local
+# test runs) tracing helpers are no-ops
+try:
+    from aws_xray_sdk.core import patch as xray_patch, xray_recorder
+except ImportError:
+    xray_patch = xray_recorder = None
+
+
+# Shared by the DynamoDB and S3 clients: fail fast and retry once instead of
+# riding out long default timeouts, and keep pooled connections alive
+# between warm invocations
+AWS_CLIENT_CONFIG = Config(
+    retries={'max_attempts': 2, 'mode': 'standard'},
+    connect_timeout=1,
+    read_timeout=3,
+    tcp_keepalive=True,
+)
+
+# Bedrock calls run for seconds rather than milliseconds, so they get a longer
+# read timeout; the larger pool covers the agent loop plus concurrent
+# embedding requests, and adaptive retries back off under throttling
+BEDROCK_CLIENT_CONFIG = Config(
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    connect_timeout=2,
+    read_timeout=30,
+    max_pool_connections=50,
+    tcp_keepalive=True,
+)
+
+
+# Returned as-is by create_response, so treat as read-only
+CORS_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization',
+}
 
 
 def setup_logging(log_level: str = "INFO") -> logging.Logger:
@@ -39,6 +90,60 @@ def setup_logging(log_level: str = "INFO") -> logging.Logger:
     return logger
 
 
+def prewarm_tables(client, *table_names: str) -> None:
+    """Resolve credentials and open a DynamoDB connection during INIT.
+    
+    boto3 resolves credentials and connects lazily, which would otherwise
+    land on the first request. Only runs inside Lambda; failures are logged
+    and left for the first request to surface. Skipped when INIT is taking
+    a SnapStart snapshot: the connection would be captured in it and be
+    dead on restore, costing the first request a retry.
+    
+    Args:
+        client: Low-level DynamoDB client to warm up
+        table_names: Names of the tables to describe
+    """
+    if not os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+        return
+    if os.getenv('AWS_LAMBDA_INITIALIZATION_TYPE') == 'snap-start':
+        return
+    
+    for table_name in table_names:
+        try:
+            client.describe_table(TableName=table_name)
+        except Exception as e:
+            logging.getLogger().warning(f"Could not prewarm table {table_name}: {str(e)}")
+
+
+def _tracing_enabled() -> bool:
+    """Whether X-Ray tracing is available in this environment."""
+    return xray_recorder is not None and bool(os.getenv('AWS_LAMBDA_FUNCTION_NAME'))
+
+
+def enable_tracing() -> None:
+    """Record every boto3 call (Bedrock, DynamoDB, S3) as an X-Ray subsegment.
+    
+    Only runs inside Lambda with the X-Ray SDK installed; the function must
+    also have active tracing enabled for segments to be sent.
+    """
+    if _tracing_enabled():
+        xray_patch(['boto3'])
+
+
+def trace_subsegment(name: str) -> ContextManager:
+    """Time a block of code as a named X-Ray subsegment.
+    
+    Args:
+        name: Subsegment name shown in the trace timeline
+        
+    Returns:
+        Context manager; a no-op when tracing is unavailable
+    """
+    if _tracing_enabled():
+        return xray_recorder.in_subsegment(name)
+    return nullcontext()
+
+
 def validate_environment_variables(required_vars: list) -> Dict[str, str]:
     """Validate that required environment variables are set.
     
@@ -69,18 +174,63 @@ def validate_environment_variables(required_vars: list) -> Dict[str, str]:
     return env_vars
 
 
+def json_loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON document, using orjson when available.
+    
+    Args:
+        data: JSON text or bytes
+        
+    Returns:
+        Parsed Python object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_request_body(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Parse the JSON object in an API Gateway event body.
+    
+    API Gateway passes body as null when the request has none; that is
+    treated as an empty object.
+    
+    Args:
+        event: API Gateway proxy event
+        
+    Returns:
+        Parsed request body
+        
+    Raises:
+        json.JSONDecodeError: If the body is not valid JSON or not an object
+    """
+    raw = event.get('body') or '{}'
+    body = json_loads(raw)
+    if not isinstance(body, dict):
+        raise json.JSONDecodeError("Request body must be a JSON object", str(raw), 0)
+    return body
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize an object to JSON text, using orjson when available.
+    
+    Args:
+        obj: Object to serialize
+        
+    Returns:
+        JSON string
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj)
+
+
 def get_cors_headers() -> Dict[str, str]:
     """Get standard CORS headers for API responses.
     
     Returns:
-        Dictionary of CORS headers
+        Shared dictionary of CORS headers; copy it before modifying
     """
-    return {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-        'Access-Control-Allow-Headers': 'Content-Type, Authorization',
-    }
+    return CORS_HEADERS
 
 
 def create_response(
@@ -98,19 +248,24 @@ def create_response(
     Returns:
         API Gateway response dictionary
     """
-    import json
-    
-    response_headers = get_cors_headers()
-    if headers:
-        response_headers.update(headers)
-    
+    return _response(status_code, json_dumps(body), headers)
+
+
+def _response(status_code: int, body: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Wrap an already-serialized body in an API Gateway response."""
     return {
         'statusCode': status_code,
-        'headers': response_headers,
-        'body': json.dumps(body)
+        'headers': {**CORS_HEADERS, **headers} if headers else CORS_HEADERS,
+        'body': body
     }
 
 
+@lru_cache(maxsize=64)
+def _error_response(status_code: int, error: str, message: str) -> Dict[str, Any]:
+    """Build an error response once per distinct (status, error, message)."""
+    return _response(status_code, json_dumps({'error': error, 'message': message}))
+
+
 def create_error_response(
     status_code: int,
     error: str,
@@ -126,14 +281,17 @@ def create_error_response(
         details: Optional additional error details
         
     Returns:
-        API Gateway error response dictionary
+        API Gateway error response dictionary; responses without details
+        are shared between calls, so treat them as read-only
     """
+    if not details:
+        # Error messages are a small fixed set, so reuse the whole response
+        return _error_response(status_code, error, message)
+    
     body = {
         'error': error,
-        'message': message
+        'message': message,
+        'details': details
     }
     
-    if details:
-        body['details'] = details
-    
     return create_response(status_code, body)
@@ -0,0 +1,134 @@
+"""
+Document vector index for the RAG agent Lambda.
+Loads a prebuilt FAISS index from S3 and memory-maps it from /tmp.
+"""
+
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import boto3
+import faiss
+import numpy as np
+
+from .utils import AWS_CLIENT_CONFIG, json_loads
+
+# Written by scripts/build_index.py: names the current index version and its
+# two objects, which live under a prefix of their own so a rebuild never
+# overwrites the files a running function is reading
+INDEX_MANIFEST_KEY = os.getenv("INDEX_MANIFEST_KEY", "index/manifest.json")
+
+# How often a loaded index checks the manifest for a rebuild
+INDEX_REFRESH_SECONDS = int(os.getenv("INDEX_REFRESH_SECONDS", "300"))
+
+# /tmp survives across warm invocations of the same execution environment
+LOCAL_INDEX_DIR = "/tmp"
+
+# Minimum cosine similarity for a chunk to count as a search hit
+SIMILARITY_THRESHOLD = 0.40
+
+# IO_FLAG_MMAP only maps IVF inverted lists; IO_FLAG_MMAP_IFC (faiss 1.10+)
+# also maps the vectors of flat and HNSW indexes instead of copying them
+# onto the heap. Older faiss falls back to mapping IVF lists only.
+INDEX_MMAP_FLAG = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+
+# Lists scanned per query by IVF indexes (built for very large corpora);
+# unset keeps the value stored in the index
+IVF_NPROBE = os.getenv("IVF_NPROBE")
+
+logger = logging.getLogger(__name__)
+
+s3_client = boto3.client('s3', config=AWS_CLIENT_CONFIG)
+
+_index = None
+_chunks: Optional[List[Dict[str, Any]]] = None
+_version: Optional[str] = None
+_local_paths: List[str] = []
+_checked_at = 0.0
+
+
+def _download(bucket: str, key: str, version: str) -> str:
+    """Download an S3 object to LOCAL_INDEX_DIR unless this version of it is already there."""
+    path = os.path.join(LOCAL_INDEX_DIR, f"{version}-{os.path.basename(key)}")
+    if not os.path.exists(path):
+        s3_client.download_file(bucket, key, path)
+    return path
+
+
+def _read_manifest(bucket: str) -> Dict[str, str]:
+    """Fetch the manifest naming the current index version and its objects."""
+    return json_loads(s3_client.get_object(Bucket=bucket, Key=INDEX_MANIFEST_KEY)['Body'].read())
+
+
+def load_index(bucket: str) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Return the document index and its chunk metadata, loading them on first use.
+
+    The index is memory-mapped read-only (see INDEX_MMAP_FLAG), so its
+    vectors are served from the OS page cache rather than copied onto the
+    heap. Every INDEX_REFRESH_SECONDS the manifest is read again and a
+    rebuilt index replaces the loaded one; if that check fails the loaded
+    index is kept.
+
+    Args:
+        bucket: Bucket holding the index files
+
+    Returns:
+        Tuple of (FAISS index, chunk records in index order)
+    """
+    global _index, _chunks, _version, _local_paths, _checked_at
+    if _index is not None and time.time() - _checked_at < INDEX_REFRESH_SECONDS:
+        return _index, _chunks
+
+    try:
+        manifest = _read_manifest(bucket)
+    except Exception as e:
+        if _index is None:
+            raise
+        logger.warning(f"Could not check for a rebuilt index: {str(e)}")
+        return _index, _chunks
+    _checked_at = time.time()
+    if manifest['version'] == _version:
+        return _index, _chunks
+
+    # Both files come from one manifest, so the chunks always match the index
+    chunks_path = _download(bucket, manifest['chunks_key'], manifest['version'])
+    index_path = _download(bucket, manifest['index_key'], manifest['version'])
+    with open(chunks_path, 'rb') as f:
+        chunks = json_loads(f.read())
+    index = faiss.read_index(index_path, INDEX_MMAP_FLAG | faiss.IO_FLAG_READ_ONLY)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and IVF_NPROBE:
+        ivf.nprobe = int(IVF_NPROBE)
+
+    # Unlinking the previous version's files is safe while they are mapped
+    for path in _local_paths:
+        if path not in (chunks_path, index_path) and os.path.exists(path):
+            os.remove(path)
+    _index, _chunks, _version = index, chunks, manifest['version']
+    _local_paths = [chunks_path, index_path]
+    return _index, _chunks
+
+
+def search(bucket: str, query_embedding: np.ndarray, top_k: int) -> List[Tuple[float, Dict[str, Any]]]:
+    """Find the chunks most similar to a query embedding.
+
+    Args:
+        bucket: Bucket holding the index files
+        query_embedding: Query vector of shape (dimension,)
+        top_k: Maximum number of results
+
+    Returns:
+        List of (cosine score, chunk record) pairs above SIMILARITY_THRESHOLD
+    """
+    index, chunks = load_index(bucket)
+    if index.ntotal == 0:
+        return []
+    query = np.array(query_embedding, dtype=np.float32).reshape(1, -1)
+    faiss.normalize_L2(query)
+    scores, positions = index.search(query, min(top_k, index.ntotal))
+    return [
+        (float(score), chunks[position])
+        for score, position in zip(scores[0], positions[0])
+        if position >= 0 and score >= SIMILARITY_THRESHOLD
+    ]
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Build the document search index for the RAG agent Lambda.
+Reads chunk embeddings from DynamoDB, builds a FAISS index, and uploads it to S3.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import boto3
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from agents.embeddings import EMBEDDING_MODEL_ID
+from agents.rag_agent import build_document_index
+
+# Must match INDEX_MANIFEST_KEY in lambda/vector_store.py
+INDEX_PREFIX = "index"
+INDEX_MANIFEST_KEY = f"{INDEX_PREFIX}/manifest.json"
+
+
+def scan_chunks(table_name: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """Read every document chunk and its embedding from the embeddings table.
+
+    Args:
+        table_name: Name of the embeddings table
+
+    Returns:
+        Tuple of (chunk records sorted by document_id, float32 embedding matrix)
+    """
+    table = boto3.resource('dynamodb').Table(table_name)
+    items = []
+    scan_kwargs = {}
+
+    while True:
+        response = table.scan(**scan_kwargs)
+        # Skip the cache and document records, which have no source document,
+        # and chunks embedded by another model, whose vectors aren't comparable
+        items.extend(
+            item for item in response['Items']
+            if 'source_document_id' in item and item.get('embedding_model') == EMBEDDING_MODEL_ID
+        )
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    if not items:
+        return [], np.empty((0, 0), dtype=np.float32)
+
+    items.sort(key=lambda item: item['document_id'])
+    chunks = [{'document_id': item['document_id'], 'content': item['content']} for item in items]
+    embeddings = np.vstack([np.frombuffer(bytes(item['embedding']), dtype=np.float32) for item in items])
+    return chunks, embeddings
+
+
+def main() -> bool:
+    """Build the index and upload it next to the documents."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--table", required=True, help="Embeddings table name (EmbeddingsTableName output)")
+    parser.add_argument("--bucket", required=True, help="Document bucket name (DocumentBucketName output)")
+    args = parser.parse_args()
+
+    import faiss
+
+    print(f"Reading chunks from {args.table}...")
+    chunks, embeddings = scan_chunks(args.table)
+    if not chunks:
+        print("No document chunks found; process some documents first.")
+        return False
+
+    print(f"Building index over {len(chunks)} chunks...")
+    index = build_document_index(embeddings)
+
+    # Each build gets its own prefix and the manifest is switched last, so
+    # readers only ever pair an index with the chunk list built alongside it
+    version = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    manifest = {
+        "version": version,
+        "index_key": f"{INDEX_PREFIX}/{version}/index.faiss",
+        "chunks_key": f"{INDEX_PREFIX}/{version}/chunks.json",
+    }
+
+    s3 = boto3.client('s3')
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "index.faiss"
+        chunks_path = Path(tmp) / "chunks.json"
+        faiss.write_index(index, str(index_path))
+        chunks_path.write_text(json.dumps(chunks))
+
+        s3.upload_file(str(chunks_path), args.bucket, manifest["chunks_key"])
+        s3.upload_file(str(index_path), args.bucket, manifest["index_key"])
+        s3.put_object(Bucket=args.bucket, Key=INDEX_MANIFEST_KEY, Body=json.dumps(manifest))
+
+    print(f"Published index version {version} to s3://{args.bucket}/{INDEX_MANIFEST_KEY}")
+    return True
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,314 @@
+import importlib
+import io
+import json
+import os
+
+import numpy as np
+from botocore.response import StreamingBody
+
+# Ensure required environment variables are present before importing the module
+os.environ.setdefault("DOCUMENT_BUCKET", "test-bucket")
+os.environ.setdefault("EMBEDDINGS_TABLE", "test-embeddings-table")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+document_processor = importlib.import_module("lambda.document_processor")
+embeddings = importlib.import_module("lambda.embeddings")
+
+
+class DummyBatchWriter:
+    def __init__(self, table):
+        self.table = table
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.table.flushes += 1
+        return False
+
+    def put_item(self, Item):
+        self.delete_item({"document_id": Item["document_id"]})
+        self.table.items.append(Item)
+
+    def delete_item(self, Key):
+        self.table.items[:] = [item for item in self.table.items if item["document_id"] != Key["document_id"]]
+
+
+class DummyTable:
+    def __init__(self):
+        self.items = []
+        self.flushes = 0
+
+    def batch_writer(self):
+        return DummyBatchWriter(self)
+
+    def get_item(self, Key, ProjectionExpression=None):
+        found = [item for item in self.items if item["document_id"] == Key["document_id"]]
+        return {"Item": found[0]} if found else {}
+
+
+class DummyDynamoDB:
+    def __init__(self, table, throttled=False):
+        self.table = table
+        self.throttled = throttled
+        self.calls = 0
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        if self.throttled:
+            return {"Responses": {}, "UnprocessedKeys": RequestItems}
+        (table_name, request), = RequestItems.items()
+        keys = {key["document_id"] for key in request["Keys"]}
+        found = [item for item in self.table.items if item["document_id"] in keys]
+        return {"Responses": {table_name: found}, "UnprocessedKeys": {}}
+
+
+class DummyS3:
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self, objects=None):
+        self.objects = objects or {}
+        self.completed = []
+        self.bodies = []
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "upload-1"}
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.example/{Params['Key']}?partNumber={Params['PartNumber']}"
+
+    def complete_multipart_upload(self, **kwargs):
+        self.completed.append(kwargs)
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey(Key)
+        self.bodies.append(io.BytesIO(self.objects[Key]))
+        return {"Body": StreamingBody(self.bodies[-1], len(self.objects[Key]))}
+
+
+def upload_event(resource, body):
+    return {"resource": resource, "body": json.dumps(body)}
+
+
+def fake_embed_texts(texts, input_type="search_document"):
+    return np.arange(len(texts) * 2, dtype=np.float32).reshape(len(texts), 2)
+
+
+def use_dummy_table(monkeypatch):
+    table = DummyTable()
+    monkeypatch.setattr(document_processor, "embeddings_table", table)
+    monkeypatch.setattr(document_processor, "dynamodb", DummyDynamoDB(table))
+    return table
+
+
+def chunk_items(table):
+    return [item for item in table.items if "source_document_id" in item]
+
+
+def test_chunk_text_overlaps_chunks():
+    chunks = document_processor.chunk_text("abcdefghij", chunk_size=4, overlap=1)
+
+    assert chunks == ["abcd", "defg", "ghij"]
+
+
+def test_chunk_text_does_not_repeat_trailing_overlap():
+    for length in range(1000, 1201):
+        text = "x" * length
+
+        chunks = document_processor.chunk_text(text, chunk_size=1000, overlap=200)
+
+        assert [len(chunk) for chunk in chunks] == ([1000] if length == 1000 else [1000, length - 800])
+
+
+def test_iter_text_chunks_matches_chunk_text_across_reads(monkeypatch):
+    monkeypatch.setattr(document_processor, "STREAM_READ_CHARS", 3)
+    text = "  the quick brown fox jumps over the lazy dog  "
+
+    chunks = list(document_processor.iter_text_chunks(io.StringIO(text), chunk_size=10, overlap=2))
+
+    # Windows start every 8 characters until one reaches the end of the text
+    expected = [text[start:start + 10].strip() for start in range(0, len(text) - 2, 8)]
+    assert chunks == [chunk for chunk in expected if chunk]
+
+
+def test_embed_texts_batches_requests(monkeypatch):
+    calls = []
+
+    def fake_embed_batch(texts, input_type):
+        calls.append(len(texts))
+        return np.zeros((len(texts), 3), dtype=np.float32)
+
+    monkeypatch.setattr(embeddings, "_embed_batch", fake_embed_batch)
+
+    result = embeddings.embed_texts([f"text {i}" for i in range(200)])
+
+    assert calls == [96, 96, 8]
+    assert result.shape == (200, 3)
+
+
+def test_handler_stores_one_item_per_chunk(monkeypatch):
+    table = use_dummy_table(monkeypatch)
+    monkeypatch.setattr(document_processor, "embed_texts", fake_embed_texts)
+    content = " ".join(str(i) for i in range(800))
+
+    response = document_processor.handler(
+        {"body": json.dumps({"document_id": "doc-1", "content": content})}, None
+    )
+
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["chunks"] == 3
+    items = chunk_items(table)
+    assert [item["document_id"] for item in items] == ["doc-1#00000", "doc-1#00001", "doc-1#00002"]
+    assert table.flushes == 1
+    assert np.frombuffer(items[1]["embedding"], dtype=np.float32).tolist() == [2.0, 3.0]
+
+
+def test_process_document_reuses_cached_embeddings(monkeypatch):
+    table = use_dummy_table(monkeypatch)
+    embedded = []
+
+    def recording_embed_texts(texts, input_type="search_document"):
+        embedded.append(len(texts))
+        return fake_embed_texts(texts, input_type)
+
+    monkeypatch.setattr(document_processor, "embed_texts", recording_embed_texts)
+    content = "x" * 3000
+
+    assert document_processor.process_document("doc-1", content) == 3
+    assert document_processor.process_document("doc-2", content) == 3
+
+    # The first two chunks are identical, and doc-2 repeats doc-1 entirely
+    assert embedded == [2]
+    assert len(chunk_items(table)) == 6
+
+
+def test_process_document_deletes_chunks_of_longer_earlier_version(monkeypatch):
+    table = use_dummy_table(monkeypatch)
+    monkeypatch.setattr(document_processor, "embed_texts", fake_embed_texts)
+
+    assert document_processor.process_document("doc-1", "a" * 3000) == 3
+    assert document_processor.process_document("doc-1", "b" * 1000) == 1
+
+    assert [(item["document_id"], item["content"]) for item in chunk_items(table)] == [("doc-1#00000", "b" * 1000)]
+
+
+def test_fetch_cached_embeddings_gives_up_on_throttled_keys(monkeypatch):
+    dynamodb = DummyDynamoDB(DummyTable(), throttled=True)
+    monkeypatch.setattr(document_processor, "dynamodb", dynamodb)
+    sleeps = []
+    monkeypatch.setattr(document_processor.time, "sleep", sleeps.append)
+
+    assert document_processor.fetch_cached_embeddings(["a", "b"]) == {}
+    assert dynamodb.calls == document_processor.MAX_BATCH_GET_ATTEMPTS
+    assert sleeps == [0.05, 0.1]
+
+
+def test_handler_requires_document_id_and_content():
+    response = document_processor.handler({"body": json.dumps({"content": "text"})}, None)
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error"] == "invalid_request"
+
+
+def test_start_upload_presigns_one_url_per_part(monkeypatch):
+    monkeypatch.setattr(document_processor, "s3_client", DummyS3())
+    size = 2 * document_processor.UPLOAD_PART_SIZE + 1
+
+    response = document_processor.handler(
+        upload_event("/documents/uploads", {"document_id": "big-doc", "size": size}), None
+    )
+
+    body = json.loads(response["body"])
+    assert response["statusCode"] == 200
+    assert body["upload_id"] == "upload-1"
+    assert body["key"] == "uploads/big-doc"
+    assert [url.rsplit("=", 1)[1] for url in body["part_urls"]] == ["1", "2", "3"]
+
+
+def test_complete_upload_orders_parts(monkeypatch):
+    s3 = DummyS3()
+    monkeypatch.setattr(document_processor, "s3_client", s3)
+    parts = [{"PartNumber": 2, "ETag": "b"}, {"PartNumber": 1, "ETag": "a"}]
+
+    response = document_processor.handler(
+        upload_event(
+            "/documents/uploads/complete",
+            {"document_id": "big-doc", "upload_id": "upload-1", "parts": parts},
+        ),
+        None,
+    )
+
+    assert response["statusCode"] == 200
+    assert [part["ETag"] for part in s3.completed[0]["MultipartUpload"]["Parts"]] == ["a", "b"]
+
+
+def test_upload_rejects_unsafe_document_id(monkeypatch):
+    monkeypatch.setattr(document_processor, "s3_client", DummyS3())
+
+    response = document_processor.handler(
+        upload_event("/documents/uploads", {"document_id": "../other", "size": 10}), None
+    )
+
+    assert response["statusCode"] == 400
+
+
+def test_handler_processes_uploaded_document(monkeypatch):
+    table = use_dummy_table(monkeypatch)
+    monkeypatch.setattr(document_processor, "embed_texts", fake_embed_texts)
+    s3 = DummyS3({"uploads/big-doc": b"uploaded text"})
+    monkeypatch.setattr(document_processor, "s3_client", s3)
+
+    response = document_processor.handler(
+        {"body": json.dumps({"document_id": "big-doc", "source": "upload"})}, None
+    )
+
+    assert response["statusCode"] == 200
+    assert [item["content"] for item in chunk_items(table)] == ["uploaded text"]
+    assert s3.bodies[0].closed
+
+
+def test_handler_closes_upload_stream_when_processing_fails(monkeypatch):
+    use_dummy_table(monkeypatch)
+    s3 = DummyS3({"uploads/big-doc": b"uploaded text"})
+    monkeypatch.setattr(document_processor, "s3_client", s3)
+
+    def failing_embed_texts(texts, input_type="search_document"):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(document_processor, "embed_texts", failing_embed_texts)
+
+    response = document_processor.handler(
+        {"body": json.dumps({"document_id": "big-doc", "source": "upload"})}, None
+    )
+
+    assert response["statusCode"] == 500
+    assert s3.bodies[0].closed
+
+
+def test_handler_rejects_non_text_upload(monkeypatch):
+    table = use_dummy_table(monkeypatch)
+    s3 = DummyS3({"uploads/big-doc": b"%PDF-1.7\n%\xe2\xe3\xcf\xd3\n"})
+    monkeypatch.setattr(document_processor, "s3_client", s3)
+
+    response = document_processor.handler(
+        {"body": json.dumps({"document_id": "big-doc", "source": "upload"})}, None
+    )
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error"] == "unsupported_document"
+    assert s3.bodies[0].closed
+    assert chunk_items(table) == []
+
+
+def test_handler_reports_missing_upload(monkeypatch):
+    monkeypatch.setattr(document_processor, "s3_client", DummyS3())
+
+    response = document_processor.handler(
+        {"body": json.dumps({"document_id": "missing", "source": "upload"})}, None
+    )
+
+    assert response["statusCode"] == 404
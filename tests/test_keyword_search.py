@@ -0,0 +1,21 @@
+from agents._keyword_search import build_keyword_index, keyword_matches
+
+
+def test_keyword_matches_documents_sharing_a_token():
+    vocab, token_ids = build_keyword_index(
+        [
+            "Strands agents call tools",
+            "AWS CDK defines infrastructure",
+            "RAG systems call a retriever",
+        ]
+    )
+
+    assert keyword_matches("Which AGENTS call tools?", vocab, token_ids).tolist() == [0, 2]
+    assert keyword_matches("cdk", vocab, token_ids).tolist() == [1]
+
+
+def test_keyword_matches_ignores_unknown_tokens():
+    vocab, token_ids = build_keyword_index(["alpha beta", "gamma"])
+
+    assert keyword_matches("delta", vocab, token_ids).size == 0
+    assert keyword_matches("", vocab, token_ids).size == 0
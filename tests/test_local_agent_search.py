@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from agents.rag_agent import build_document_index, load_or_build_document_index
+
+
+def test_build_document_index_returns_cosine_scores():
+    embeddings = np.array(
+        [
+            [3.0, 0.0, 0.0],
+            [0.0, 2.0, 0.0],
+            [1.0, 1.0, 0.0],
+        ],
+        dtype=np.float32,
+    )
+    index = build_document_index(embeddings)
+
+    query = np.array([[5.0, 0.0, 0.0]], dtype=np.float32)
+    faiss.normalize_L2(query)
+    scores, positions = index.search(query, 3)
+
+    assert positions[0].tolist() == [0, 2, 1]
+    assert scores[0][0] == pytest.approx(1.0)
+    assert scores[0][1] == pytest.approx(np.sqrt(0.5))
+    assert scores[0][2] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_build_document_index_uses_hnsw_above_threshold():
+    embeddings = np.random.default_rng(0).random((8, 4), dtype=np.float32)
+
+    index = build_document_index(embeddings, hnsw_threshold=8)
+
+    assert isinstance(index, faiss.IndexHNSWFlat)
+    assert index.ntotal == 8
+    assert index.hnsw.efSearch == 64
+
+
+def test_load_or_build_document_index_reuses_persisted_index(tmp_path):
+    calls = []
+
+    class FakeEmbeddings:
+        EMBEDDING_MODEL_ID = "test-model"
+
+        @staticmethod
+        def embed_texts(texts):
+            calls.append(list(texts))
+            return np.eye(len(texts), dtype=np.float32)
+
+    texts = ["alpha", "beta"]
+    first = load_or_build_document_index(texts, FakeEmbeddings, index_dir=str(tmp_path))
+    second = load_or_build_document_index(texts, FakeEmbeddings, index_dir=str(tmp_path))
+
+    assert calls == [texts]
+    assert first.ntotal == second.ntotal == 2
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_build_document_index_folds_pca_into_index():
+    embeddings = np.random.default_rng(1).random((300, 512), dtype=np.float32)
+    query = embeddings[:1].copy()
+
+    index = build_document_index(embeddings, pca_min_training_points=300)
+
+    assert isinstance(index, faiss.IndexPreTransform)
+    assert index.index.d == 256
+    faiss.normalize_L2(query)
+    scores, positions = index.search(query, 1)
+    assert positions[0][0] == 0
+    assert scores[0][0] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_build_document_index_quantizes_above_ivfpq_threshold(monkeypatch):
+    # Smaller codebooks keep training fast enough for a unit test
+    monkeypatch.setattr("agents.rag_agent.PQ_BITS", 4)
+    embeddings = np.random.default_rng(2).random((400, 8), dtype=np.float32)
+    query = embeddings[:1].copy()
+
+    index = build_document_index(embeddings, hnsw_threshold=100, ivfpq_threshold=400)
+
+    assert isinstance(index, faiss.IndexIVFPQ)
+    assert index.ntotal == 400
+    assert index.nprobe == 16
+    faiss.normalize_L2(query)
+    _, positions = index.search(query, 5)
+    assert 0 in positions[0]
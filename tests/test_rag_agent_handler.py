@@ -0,0 +1,252 @@
+import importlib
+import json
+import os
+import sys
+import types
+from collections import OrderedDict
+
+import numpy as np
+
+# Ensure required environment variables are present before importing the module
+os.environ.setdefault("DOCUMENT_BUCKET", "test-bucket")
+os.environ.setdefault("CONVERSATION_TABLE", "test-conversation-table")
+os.environ.setdefault("EMBEDDINGS_TABLE", "test-embeddings-table")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+rag_agent = importlib.import_module("lambda.rag_agent")
+
+
+class CountingAgent:
+    def __init__(self):
+        self.prompts = []
+        self.messages = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        self.messages.append(prompt)
+        return f"answer: {prompt}"
+
+
+def test_handler_reuses_agent_with_fresh_messages(monkeypatch):
+    agent = CountingAgent()
+    agent.messages = ["left over from an earlier request"]
+    monkeypatch.setattr(rag_agent, "AGENT", agent)
+    monkeypatch.setattr(rag_agent, "create_rag_agent", lambda: None)
+    monkeypatch.setattr(rag_agent, "save_conversation_messages", lambda items: True)
+
+    for message in ["first", "second"]:
+        response = rag_agent.handler({"body": json.dumps({"message": message})}, None)
+        assert json.loads(response["body"])["message"] == f"answer: {message}"
+        assert agent.messages == [message]
+
+
+def test_handler_saves_exchange_in_one_batch(monkeypatch):
+    batches = []
+    monkeypatch.setattr(rag_agent, "AGENT", CountingAgent())
+    monkeypatch.setattr(rag_agent, "save_conversation_messages", lambda items: batches.append(items) or True)
+
+    rag_agent.handler({"body": json.dumps({"message": "Hi", "conversation_id": "c1"})}, None)
+
+    assert len(batches) == 1
+    assert [(item["role"], item["content"]) for item in batches[0]] == [("user", "Hi"), ("assistant", "answer: Hi")]
+
+
+class DummyDynamoDBClient:
+    def __init__(self, unprocessed_batches=0):
+        self.items = {}
+        self.unprocessed_batches = unprocessed_batches
+        self.batch_calls = []
+
+    def get_item(self, TableName, Key):
+        item = self.items.get(Key["document_id"]["S"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, TableName, Item):
+        self.items[Item["document_id"]["S"]] = Item
+
+    def batch_get_item(self, RequestItems):
+        (table_name, request), = RequestItems.items()
+        found = [self.items[key["document_id"]["S"]] for key in request["Keys"] if key["document_id"]["S"] in self.items]
+        return {"Responses": {table_name: found}, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, RequestItems):
+        self.batch_calls.append(RequestItems)
+        for requests in RequestItems.values():
+            for request in requests:
+                item = request["PutRequest"]["Item"]
+                if "document_id" in item:
+                    self.items[item["document_id"]["S"]] = item
+        if self.unprocessed_batches:
+            self.unprocessed_batches -= 1
+            return {"UnprocessedItems": RequestItems}
+        return {"UnprocessedItems": {}}
+
+
+def test_embed_query_reuses_cached_embedding(monkeypatch):
+    calls = []
+
+    def fake_embed_texts(texts, input_type="search_document"):
+        calls.append(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    client = DummyDynamoDBClient()
+    monkeypatch.setattr(rag_agent, "dynamodb_client", client)
+    monkeypatch.setattr(rag_agent, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(rag_agent, "_query_embeddings", OrderedDict())
+
+    first = rag_agent.embed_query("What is RAG?")
+    second = rag_agent.embed_query("  what is   RAG? ")
+    rag_agent._query_embeddings.clear()
+    third = rag_agent.embed_query("What is RAG?")
+
+    # The second lookup is served from memory, the third from the table
+    assert calls == [["what is rag?"]]
+    assert second.tolist() == first.tolist() == third.tolist()
+    assert len(client.items) == 1
+
+
+def test_embed_query_ignores_embedding_cached_for_another_model(monkeypatch):
+    calls = []
+
+    def fake_embed_texts(texts, input_type="search_document"):
+        calls.append(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+    client = DummyDynamoDBClient()
+    monkeypatch.setattr(rag_agent, "dynamodb_client", client)
+    monkeypatch.setattr(rag_agent, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(rag_agent, "_query_embeddings", OrderedDict())
+
+    rag_agent.embed_query("What is RAG?")
+    (item,) = client.items.values()
+    item["embedding_model"] = {"S": "some-older-model"}
+    item["embedding"] = {"B": np.zeros(4, dtype=np.float32).tobytes()}
+    rag_agent._query_embeddings.clear()
+    result = rag_agent.embed_query("What is RAG?")
+
+    assert calls == [["what is rag?"], ["what is rag?"]]
+    assert result.tolist() == [1.0, 1.0, 1.0, 1.0]
+
+
+def test_embed_queries_embeds_misses_in_one_request(monkeypatch):
+    calls = []
+
+    def fake_embed_texts(texts, input_type="search_document"):
+        calls.append(texts)
+        return np.arange(len(texts) * 2, dtype=np.float32).reshape(len(texts), 2)
+
+    monkeypatch.setattr(rag_agent, "dynamodb_client", DummyDynamoDBClient())
+    monkeypatch.setattr(rag_agent, "embed_texts", fake_embed_texts)
+    monkeypatch.setattr(rag_agent, "_query_embeddings", OrderedDict())
+
+    rag_agent.embed_query("alpha")
+    result = rag_agent.embed_queries(["beta", "alpha", "gamma", "Beta"])
+
+    assert calls == [["alpha"], ["beta", "gamma"]]
+    assert result.shape == (4, 2)
+    assert result[0].tolist() == result[3].tolist()
+
+
+def test_get_agent_does_not_retry_missing_strands(monkeypatch):
+    attempts = []
+    monkeypatch.setattr(rag_agent, "AGENT", None)
+    monkeypatch.setattr(rag_agent, "AGENT_INIT_ERROR", ImportError("No module named 'strands'"))
+    monkeypatch.setattr(rag_agent, "create_rag_agent", lambda: attempts.append(1))
+
+    assert rag_agent.get_agent() is None
+    assert attempts == []
+
+
+def test_save_conversation_messages_retries_unprocessed_items(monkeypatch):
+    client = DummyDynamoDBClient(unprocessed_batches=1)
+    monkeypatch.setattr(rag_agent, "dynamodb_client", client)
+    monkeypatch.setattr(rag_agent.time, "sleep", lambda seconds: None)
+    items = [
+        rag_agent.conversation_item("c1", "user", "Hi", "2024-01-01T00:00:00"),
+        rag_agent.conversation_item("c1", "assistant", "Hello", "2024-01-01T00:00:01"),
+    ]
+
+    assert rag_agent.save_conversation_messages(items) is True
+
+    assert len(client.batch_calls) == 2
+    request = client.batch_calls[0]["test-conversation-table"][1]["PutRequest"]["Item"]
+    assert request == {
+        "conversation_id": {"S": "c1"},
+        "timestamp": {"S": "2024-01-01T00:00:01"},
+        "role": {"S": "assistant"},
+        "content": {"S": "Hello"},
+    }
+
+
+def test_handler_gives_each_message_its_own_timestamp(monkeypatch):
+    batches = []
+    monkeypatch.setattr(rag_agent, "_last_timestamp_us", 0)
+    monkeypatch.setattr(rag_agent.time, "time_ns", lambda: 1_700_000_000_000_000_000)
+    monkeypatch.setattr(rag_agent, "AGENT", CountingAgent())
+    monkeypatch.setattr(rag_agent, "save_conversation_messages", lambda items: batches.append(items) or True)
+
+    for message in ["First", "Second"]:
+        rag_agent.handler({"body": json.dumps({"message": message, "conversation_id": "c1"})}, None)
+
+    timestamps = [item["timestamp"] for batch in batches for item in batch]
+    assert len(set(timestamps)) == 4
+    assert min(timestamps).startswith("2023-11-14T22:13:20.")
+
+
+def test_validate_conversation_id_rejects_disallowed_characters():
+    assert rag_agent.validate_conversation_id("conv-1_a")
+    assert not rag_agent.validate_conversation_id("conv-1\n")
+    assert not rag_agent.validate_conversation_id("conv 1")
+    assert not rag_agent.validate_conversation_id("c" * (rag_agent.MAX_CONVERSATION_ID_LENGTH + 1))
+
+
+def test_sanitize_input_drops_control_characters_but_keeps_newlines():
+    assert rag_agent.sanitize_input("  a\tb\x00c\nd\u200be\U0001F600  ") == "abc\nde\U0001F600"
+
+
+def test_sanitize_input_returns_printable_text_unchanged():
+    text = "What is RAG? \u00e9\U0001F600"
+
+    assert rag_agent.sanitize_input(f"  {text} ") == text
+    assert rag_agent.sanitize_input("a\u200bb") == "ab"
+
+
+def test_handler_rejects_missing_or_non_object_body():
+    for body in (None, json.dumps(["not", "an", "object"])):
+        response = rag_agent.handler({"body": body}, None)
+
+        assert response["statusCode"] == 400
+
+
+def test_handler_rejects_oversized_body_before_parsing(monkeypatch):
+    def fail_parse(event):
+        raise AssertionError("body should not be parsed")
+
+    monkeypatch.setattr(rag_agent, "parse_request_body", fail_parse)
+
+    response = rag_agent.handler({"body": " " * (rag_agent.MAX_REQUEST_BODY_LENGTH + 1)}, None)
+
+    assert response["statusCode"] == 400
+    assert json.loads(response["body"])["error"] == "message_too_long"
+
+
+def test_create_rag_agent_sets_prompt_cache_points(monkeypatch):
+    models = []
+
+    def fake_module(name, **attributes):
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    fake_module("strands", Agent=lambda **kwargs: kwargs, tool=lambda function: function)
+    fake_module("strands.models", BedrockModel=lambda **kwargs: models.append(kwargs) or kwargs)
+    fake_module("strands_tools", calculator=object(), http_request=object())
+
+    monkeypatch.setattr(rag_agent, "PROMPT_CACHE", True)
+    rag_agent.create_rag_agent()
+    monkeypatch.setattr(rag_agent, "PROMPT_CACHE", False)
+    rag_agent.create_rag_agent()
+
+    assert (models[0]["cache_prompt"], models[0]["cache_tools"]) == ("default", "default")
+    assert (models[1]["cache_prompt"], models[1]["cache_tools"]) == (None, None)
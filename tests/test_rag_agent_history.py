@@ -1,8 +1,10 @@
 import importlib
 import os
 
+import boto3
+
 import pytest
-from boto3.dynamodb.conditions import Equals
+from botocore.exceptions import ClientError
 
 # Ensure required environment variables are present before importing the module
 os.environ.setdefault("DOCUMENT_BUCKET", "test-bucket")
@@ -14,7 +16,13 @@ os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
 rag_agent = importlib.import_module("lambda.rag_agent")
 
 
-class DummyTable:
+@pytest.fixture(autouse=True)
+def clear_history_cache():
+    rag_agent._fetch_history.cache_clear()
+    rag_agent._saved_timestamps.clear()
+
+
+class DummyClient:
     def __init__(self, items=None, exc: Exception | None = None):
         self.items = items or []
         self.exc = exc
@@ -24,17 +32,19 @@ class DummyTable:
         self.calls.append(kwargs)
         if self.exc:
             raise self.exc
-        return {"Items": self.items}
+        items = self.items if kwargs.get("ScanIndexForward", True) else self.items[::-1]
+        items = items[: kwargs.get("Limit", len(items))]
+        return {"Items": [{name: {"S": value} for name, value in item.items()} for item in items]}
 
 
 def test_fetch_conversation_history_formats_messages(monkeypatch):
-    table = DummyTable(
+    table = DummyClient(
         [
             {"role": "user", "content": "Hello"},
             {"role": "assistant", "content": "Hi there"},
         ]
     )
-    monkeypatch.setattr(rag_agent, "conversation_table", table)
+    monkeypatch.setattr(rag_agent, "dynamodb_client", table)
 
     result = rag_agent.fetch_conversation_history("conversation-1")
 
@@ -42,15 +52,106 @@ def test_fetch_conversation_history_formats_messages(monkeypatch):
     assert "assistant: Hi there" in result
     assert table.calls
     call = table.calls[0]
-    assert isinstance(call["KeyConditionExpression"], Equals)
-    assert call["ScanIndexForward"] is True
+    assert call["TableName"] == "test-conversation-table"
+    assert call["ExpressionAttributeValues"] == {":cid": {"S": "conversation-1"}}
+    assert call["ScanIndexForward"] is False
     assert call["Limit"] == 10
+    assert call["ProjectionExpression"] == "#role, content"
+    assert call["ExpressionAttributeNames"] == {"#role": "role"}
+    assert call["ConsistentRead"] is False
+
+
+def test_fetch_conversation_history_returns_latest_messages_in_order(monkeypatch):
+    table = DummyClient([{"role": "user", "content": f"message {i}"} for i in range(25)])
+    monkeypatch.setattr(rag_agent, "dynamodb_client", table)
+
+    result = rag_agent.fetch_conversation_history("conversation-5")
+
+    assert result.splitlines() == [f"user: message {i}" for i in range(15, 25)]
+
+
+def test_fetch_conversation_history_caches_within_window(monkeypatch):
+    table = DummyClient([{"role": "user", "content": "Hello"}])
+    monkeypatch.setattr(rag_agent, "dynamodb_client", table)
+    now = [1000.0]
+    monkeypatch.setattr(rag_agent.time, "time", lambda: now[0])
+
+    first = rag_agent.fetch_conversation_history("conversation-3")
+    second = rag_agent.fetch_conversation_history("conversation-3")
+    now[0] += rag_agent.HISTORY_CACHE_SECONDS
+    rag_agent.fetch_conversation_history("conversation-3")
+
+    assert first == second
+    assert len(table.calls) == 2
 
 
 def test_fetch_conversation_history_handles_errors(monkeypatch):
-    table = DummyTable(exc=Exception("boom"))
-    monkeypatch.setattr(rag_agent, "conversation_table", table)
+    table = DummyClient(exc=ClientError({"Error": {"Code": "ThrottlingException"}}, "Query"))
+    monkeypatch.setattr(rag_agent, "dynamodb_client", table)
 
     result = rag_agent.fetch_conversation_history("conversation-2")
 
     assert result == "Error retrieving conversation history."
+    assert rag_agent._fetch_history.cache_info().currsize == 0
+
+
+def test_fetch_conversation_history_propagates_unexpected_errors(monkeypatch):
+    monkeypatch.setattr(rag_agent, "dynamodb_client", DummyClient(exc=RuntimeError("bug")))
+
+    with pytest.raises(RuntimeError):
+        rag_agent.fetch_conversation_history("conversation-2")
+
+
+def test_history_client_defaults_to_dynamodb(monkeypatch):
+    monkeypatch.setattr(rag_agent, "DAX_ENDPOINT", None)
+
+    assert rag_agent.history_client() is rag_agent.dynamodb_client
+
+
+def test_saving_a_message_invalidates_cached_history(monkeypatch):
+    table = DummyClient([{"role": "user", "content": "Hello"}])
+    monkeypatch.setattr(rag_agent, "dynamodb_client", table)
+    monkeypatch.setattr(table, "put_item", lambda **kwargs: None, raising=False)
+    monkeypatch.setattr(rag_agent.time, "time", lambda: 1000.0)
+
+    rag_agent.fetch_conversation_history("conversation-4")
+    rag_agent.fetch_conversation_history("conversation-4")
+    rag_agent.save_conversation_message("conversation-4", "assistant", "Hi", "2024-01-01T00:00:00")
+    rag_agent.fetch_conversation_history("conversation-4")
+
+    assert len(table.calls) == 2
+
+
+@pytest.fixture
+def conversation_table(monkeypatch):
+    moto = pytest.importorskip("moto")
+    with moto.mock_aws():
+        client = boto3.client("dynamodb", region_name="us-east-1")
+        client.create_table(
+            TableName="test-conversation-table",
+            KeySchema=[
+                {"AttributeName": "conversation_id", "KeyType": "HASH"},
+                {"AttributeName": "timestamp", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "conversation_id", "AttributeType": "S"},
+                {"AttributeName": "timestamp", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        monkeypatch.setattr(rag_agent, "dynamodb_client", client)
+        monkeypatch.setattr(rag_agent, "DAX_ENDPOINT", None)
+        yield client
+
+
+def test_fetch_conversation_history_against_dynamodb(conversation_table):
+    items = [
+        rag_agent.conversation_item(conversation_id, "user", f"{conversation_id} {i}", f"2024-01-01T00:00:{i:02d}")
+        for conversation_id in ("conversation-6", "conversation-7")
+        for i in range(25)
+    ]
+    assert rag_agent.save_conversation_messages(items)
+
+    result = rag_agent.fetch_conversation_history("conversation-6")
+
+    assert result.splitlines() == [f"user: conversation-6 {i}" for i in range(15, 25)]
@@ -0,0 +1,29 @@
+import numpy as np
+
+from agents._search_numba import normalize_rows, topk_cosine
+
+
+def test_topk_cosine_orders_by_similarity():
+    matrix = normalize_rows(
+        np.array(
+            [
+                [0.0, 1.0],
+                [1.0, 0.0],
+                [1.0, 1.0],
+            ]
+        )
+    )
+
+    scores, positions = topk_cosine(np.array([2.0, 0.0], dtype=np.float32), matrix, 2)
+
+    assert positions.tolist() == [1, 2]
+    assert np.isclose(scores[0], 1.0)
+    assert np.isclose(scores[1], np.sqrt(0.5))
+
+
+def test_topk_cosine_clamps_k_to_corpus_size():
+    matrix = normalize_rows(np.eye(2))
+
+    scores, positions = topk_cosine(np.array([1.0, 0.0], dtype=np.float32), matrix, 5)
+
+    assert len(positions) == 2
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+
+from agents.rag_agent import ask_agent
+from agents.semantic_cache import SemanticCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def vec(*values):
+    return np.array([values], dtype=np.float32)
+
+
+def test_get_returns_response_for_similar_query():
+    cache = SemanticCache(tau=0.85)
+    cache.put(vec(1.0, 0.0, 0.0), "cached answer")
+
+    assert cache.get(vec(0.99, 0.1, 0.0)) == "cached answer"
+    assert cache.get(vec(0.0, 1.0, 0.0)) is None
+
+
+def test_near_duplicate_put_overwrites_entry():
+    cache = SemanticCache()
+    cache.put(vec(1.0, 0.0, 0.0), "first")
+    cache.put(vec(1.0, 0.01, 0.0), "second")
+
+    assert len(cache) == 1
+    assert cache.get(vec(1.0, 0.0, 0.0)) == "second"
+
+
+def test_expired_entries_are_dropped():
+    clock = FakeClock()
+    cache = SemanticCache(clock=clock)
+    cache.put(vec(1.0, 0.0), "answer", ttl=10)
+
+    clock.now = 11
+    assert cache.get(vec(1.0, 0.0)) is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity():
+    cache = SemanticCache(capacity=2)
+    cache.put(vec(1.0, 0.0, 0.0), "a")
+    cache.put(vec(0.0, 1.0, 0.0), "b")
+    cache.get(vec(1.0, 0.0, 0.0))
+    cache.put(vec(0.0, 0.0, 1.0), "c")
+
+    assert len(cache) == 2
+    assert cache.get(vec(1.0, 0.0, 0.0)) == "a"
+    assert cache.get(vec(0.0, 1.0, 0.0)) is None
+    assert cache.get(vec(0.0, 0.0, 1.0)) == "c"
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.messages = []
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        self.messages += [{"role": "user", "content": [{"text": prompt}]}, {"role": "assistant", "content": [{"text": prompt}]}]
+        return f"answer: {prompt}"
+
+
+EMBEDDINGS = {
+    "What is RAG?": (1.0, 0.0, 0.0),
+    "What's RAG?": (0.99, 0.1, 0.0),
+    "What is CDK?": (0.0, 1.0, 0.0),
+    "What is RAG?\nTell me more": (0.0, 0.0, 1.0),
+    "What's RAG?\nTell me more": (0.0, 0.1, 0.99),
+    "What is CDK?\nTell me more": (0.0, 0.7, 0.7),
+}
+
+
+def fake_embed_texts(texts, input_type="search_document"):
+    return vec(*EMBEDDINGS[texts[0]])
+
+
+def test_ask_agent_reuses_answers_given_in_a_similar_context():
+    cache = SemanticCache(tau=0.85)
+    first = RecordingAgent()
+    ask_agent(first, "What is RAG?", cache, fake_embed_texts)
+    ask_agent(first, "Tell me more", cache, fake_embed_texts)
+
+    second = RecordingAgent()
+    assert ask_agent(second, "What's RAG?", cache, fake_embed_texts) == "answer: What is RAG?"
+    assert ask_agent(second, "Tell me more", cache, fake_embed_texts) == "answer: Tell me more"
+    assert second.prompts == []
+    assert [message["role"] for message in second.messages] == ["user", "assistant"] * 2
+
+    # The same follow-up after a different question is a miss
+    third = RecordingAgent()
+    ask_agent(third, "What is CDK?", cache, fake_embed_texts)
+    ask_agent(third, "Tell me more", cache, fake_embed_texts)
+    assert third.prompts == ["What is CDK?", "Tell me more"]
@@ -0,0 +1,96 @@
+import importlib
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+vector_store = importlib.import_module("lambda.vector_store")
+
+
+def publish(bucket, version, contents):
+    (bucket / "index" / version).mkdir(parents=True)
+    index = faiss.IndexFlatIP(2)
+    index.add(np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32))
+    faiss.write_index(index, str(bucket / "index" / version / "index.faiss"))
+    (bucket / "index" / version / "chunks.json").write_text(
+        json.dumps([{"document_id": f"{content}#00000", "content": content} for content in contents])
+    )
+    manifest = {
+        "version": version,
+        "index_key": f"index/{version}/index.faiss",
+        "chunks_key": f"index/{version}/chunks.json",
+    }
+    (bucket / vector_store.INDEX_MANIFEST_KEY).write_text(json.dumps(manifest))
+
+
+@pytest.fixture
+def index_bucket(tmp_path, monkeypatch):
+    bucket = tmp_path / "bucket"
+    publish(bucket, "v1", ["alpha", "beta"])
+
+    downloads = []
+
+    def download_file(bucket_name, key, path):
+        downloads.append(key)
+        shutil.copy(bucket / key, path)
+
+    def get_object(Bucket, Key):
+        return {"Body": io.BytesIO((bucket / Key).read_bytes())}
+
+    local_dir = tmp_path / "local"
+    local_dir.mkdir()
+    monkeypatch.setattr(vector_store.s3_client, "download_file", download_file)
+    monkeypatch.setattr(vector_store.s3_client, "get_object", get_object)
+    monkeypatch.setattr(vector_store, "LOCAL_INDEX_DIR", str(local_dir))
+    monkeypatch.setattr(vector_store, "_index", None)
+    monkeypatch.setattr(vector_store, "_chunks", None)
+    monkeypatch.setattr(vector_store, "_version", None)
+    monkeypatch.setattr(vector_store, "_local_paths", [])
+    monkeypatch.setattr(vector_store, "_checked_at", 0.0)
+    return bucket, downloads
+
+
+def test_search_returns_chunks_above_threshold(index_bucket):
+    results = vector_store.search("bucket", np.array([3.0, 0.5]), 2)
+
+    assert [chunk["content"] for _, chunk in results] == ["alpha"]
+    assert results[0][0] == pytest.approx(3.0 / np.hypot(3.0, 0.5))
+
+
+def test_load_index_downloads_once(index_bucket):
+    _, downloads = index_bucket
+
+    vector_store.load_index("bucket")
+    vector_store.search("bucket", np.array([0.0, 1.0]), 1)
+
+    assert sorted(downloads) == ["index/v1/chunks.json", "index/v1/index.faiss"]
+
+
+def test_load_index_picks_up_rebuilt_index(index_bucket, monkeypatch):
+    bucket, _ = index_bucket
+    now = [1000.0]
+    monkeypatch.setattr(vector_store.time, "time", lambda: now[0])
+
+    vector_store.load_index("bucket")
+    publish(bucket, "v2", ["gamma", "delta"])
+    assert vector_store.load_index("bucket")[1][0]["content"] == "alpha"
+
+    now[0] += vector_store.INDEX_REFRESH_SECONDS
+    _, chunks = vector_store.load_index("bucket")
+
+    assert [chunk["content"] for chunk in chunks] == ["gamma", "delta"]
+    assert sorted(os.listdir(vector_store.LOCAL_INDEX_DIR)) == ["v2-chunks.json", "v2-index.faiss"]
+
+
+def test_search_returns_nothing_for_empty_index(index_bucket, monkeypatch):
+    monkeypatch.setattr(vector_store, "load_index", lambda bucket: (faiss.IndexFlatIP(2), []))
+
+    assert vector_store.search("bucket", np.array([1.0, 0.0]), 3) == []